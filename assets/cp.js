@@ -0,0 +1,198 @@
+// The number of frames in each chunk of playback frames computed by the server (`CP_TIME_WINDOW_SECONDS` in
+// `dashboard/callbacks.py`).
+const PLAYBACK_CHUNK_FRAMES = 60;
+
+// The chunk after the buffered playback frames is requested when this many buffered frames are left to play.
+const PLAYBACK_PREFETCH_FRAMES = 30;
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  cp: {
+    /**
+     * Plot the Cp profile for the second selected on the time slider from the profiles computed for the whole time
+     * window by the server, so moving the slider doesn't need a request to the server.
+     *
+     * @param {Object} profiles - the empty Cp figure and the Cp of each sensor for each second of the time window
+     * @param {number} timeDelta - the number of seconds after the start of the time window to plot
+     * @returns {Object} the figure
+     */
+    plotProfile: function (profiles, timeDelta) {
+      if (!profiles) {
+        return window.dash_clientside.no_update;
+      }
+
+      const trace = Object.assign({}, profiles.figure.data[0], {
+        y: profiles.cp[timeDelta] || [],
+      });
+
+      return Object.assign({}, profiles.figure, { data: [trace] });
+    },
+
+    /**
+     * Start or pause Cp playback. Playback restarts from the beginning if it had reached the end; otherwise it resumes
+     * from where it was paused. The buffered frames are cleared and the chunk of frames starting at the current
+     * position is requested from the server each time playback starts so that any changed inputs are used.
+     *
+     * @param {number} nClicks - the number of times the play/pause button has been clicked
+     * @param {boolean} paused - whether playback is currently paused
+     * @param {number} frameRate - the number of frames (seconds of data) to play per second
+     * @param {number} position - the current playback position in seconds since the start of the playback period
+     * @param {number} duration - the length of the playback period in minutes
+     * @returns {Array} whether playback is paused, the interval between frames in milliseconds, the button's label, the playback position, the request for frames, and the buffered frames
+     */
+    togglePlayback: function (nClicks, paused, frameRate, position, duration) {
+      const noUpdate = window.dash_clientside.no_update;
+      const frameInterval = 1000 / Math.max(frameRate || 1, 0.1);
+
+      if (!paused) {
+        return [true, frameInterval, "Play", noUpdate, noUpdate, noUpdate];
+      }
+
+      if (!position || position >= duration * 60) {
+        position = 0;
+      }
+
+      return [
+        false,
+        frameInterval,
+        "Pause",
+        position,
+        { position: position, time: Date.now() },
+        null,
+      ];
+    },
+
+    /**
+     * Add a newly loaded chunk of playback frames to the buffered frames. A chunk following on from the buffered frames
+     * is appended to them (dropping the frames already played) so playback can carry on into it; any other chunk
+     * replaces them. Chunks that weren't the last one requested (e.g. responses to requests made before playback was
+     * restarted) are ignored.
+     *
+     * @param {Object} frames - the newly loaded chunk of frames
+     * @param {Object} request - the last request for a chunk of frames
+     * @param {number} position - the current playback position in seconds since the start of the playback period
+     * @param {Object} buffer - the buffered frames
+     * @returns {Object} the buffered frames, including the position of the last chunk loaded into them
+     */
+    bufferPlaybackFrames: function (frames, request, position, buffer) {
+      if (!frames || !request || frames.position !== request.position) {
+        return window.dash_clientside.no_update;
+      }
+
+      if (buffer && frames.position === buffer.position + buffer.cp.length) {
+        const played = Math.max(
+          Math.min(position || 0, frames.position) - buffer.position,
+          0
+        );
+
+        return {
+          position: buffer.position + played,
+          figure: frames.figure,
+          cp: buffer.cp.slice(played).concat(frames.cp),
+          lastChunkPosition: frames.position,
+        };
+      }
+
+      return Object.assign({}, frames, { lastChunkPosition: frames.position });
+    },
+
+    /**
+     * Move Cp playback on by one frame if it's been loaded, requesting the chunk of frames after the buffered ones
+     * ahead of time so playback doesn't stall at the end of each chunk. If the frame hasn't been loaded, wait for it if
+     * it's in the chunk already requested; otherwise request the chunk starting with it. Playback is paused when it
+     * reaches the end of the playback period.
+     *
+     * @param {number} nIntervals - the number of frames the playback interval has fired for
+     * @param {number} position - the current playback position in seconds since the start of the playback period
+     * @param {Object} buffer - the buffered frames
+     * @param {Object} request - the last request for a chunk of frames
+     * @param {number} duration - the length of the playback period in minutes
+     * @returns {Array} the playback position, the request for frames, whether playback is paused, and the button's label
+     */
+    advancePlayback: function (
+      nIntervals,
+      position,
+      buffer,
+      request,
+      duration
+    ) {
+      const noUpdate = window.dash_clientside.no_update;
+      const next = (position || 0) + 1;
+      const end = duration * 60;
+
+      if (next > end) {
+        return [noUpdate, noUpdate, true, "Play"];
+      }
+
+      const pending =
+        request && (!buffer || buffer.lastChunkPosition !== request.position);
+
+      if (
+        buffer &&
+        next >= buffer.position &&
+        next < buffer.position + buffer.cp.length
+      ) {
+        const bufferEnd = buffer.position + buffer.cp.length;
+
+        if (
+          !pending &&
+          bufferEnd <= end &&
+          bufferEnd - next <= PLAYBACK_PREFETCH_FRAMES
+        ) {
+          return [
+            next,
+            { position: bufferEnd, time: Date.now() },
+            noUpdate,
+            noUpdate,
+          ];
+        }
+
+        return [next, noUpdate, noUpdate, noUpdate];
+      }
+
+      // Requesting another chunk while one is being computed would make Dash discard the response to the first.
+      if (
+        pending &&
+        next >= request.position &&
+        next < request.position + PLAYBACK_CHUNK_FRAMES
+      ) {
+        return [noUpdate, noUpdate, noUpdate, noUpdate];
+      }
+
+      return [
+        noUpdate,
+        { position: next, time: Date.now() },
+        noUpdate,
+        noUpdate,
+      ];
+    },
+
+    /**
+     * Plot the Cp profile for the current playback position if it's been loaded into the buffered frames.
+     *
+     * @param {number} position - the current playback position in seconds since the start of the playback period
+     * @param {Object} buffer - the buffered frames
+     * @param {number} duration - the length of the playback period in minutes
+     * @returns {Array} the figure and the playback time to show
+     */
+    plotPlaybackFrame: function (position, buffer, duration) {
+      const noUpdate = window.dash_clientside.no_update;
+
+      if (
+        !buffer ||
+        position < buffer.position ||
+        position >= buffer.position + buffer.cp.length
+      ) {
+        return [noUpdate, `Loading ${position} s of ${duration * 60} s...`];
+      }
+
+      const trace = Object.assign({}, buffer.figure.data[0], {
+        y: buffer.cp[position - buffer.position],
+      });
+
+      return [
+        Object.assign({}, buffer.figure, { data: [trace] }),
+        `${position} s of ${duration * 60} s`,
+      ];
+    },
+  },
+});
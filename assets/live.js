@@ -0,0 +1,119 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  live: {
+    /**
+     * Subscribe a graph to the server's live data stream for its sensor, appending new data to its traces as it's
+     * pushed by the server. If the server turns the stream away because it has too many live viewers, it's polled for
+     * new data instead. Any previous subscription of the graph is closed first, and none is opened if live mode is
+     * off.
+     *
+     * @param {Object} liveState - the live query, the datetime of the last plotted row, the index of each trace, the maximum number of points per trace, and the number of seconds between polls of the server for new data
+     * @param {string} graphId - the ID of the graph
+     * @returns {string} the status of the subscription
+     */
+    subscribe: function (liveState, graphId) {
+      const sources = (window.liveDataSources = window.liveDataSources || {});
+
+      if (sources[graphId]) {
+        sources[graphId].close();
+        delete sources[graphId];
+      }
+
+      if (!liveState) {
+        return "";
+      }
+
+      let lastDatetime = liveState.last_datetime;
+
+      const getQueryString = function () {
+        return new URLSearchParams({
+          installation_reference: liveState.installation_reference,
+          node_id: liveState.node_id || "",
+          sensor_name: liveState.sensor_name,
+          since: lastDatetime,
+        }).toString();
+      };
+
+      const addData = function (data) {
+        // Skip any rows already plotted (e.g. recent rows replayed to new subscribers). The datetimes all have the
+        // same format so they can be compared as strings.
+        const isNew = data.x.map((datetime) => datetime > lastDatetime);
+        const x = data.x.filter((_, i) => isNew[i]);
+
+        const columns = Object.keys(data.y).filter(
+          (column) => column in liveState.trace_indices
+        );
+
+        const container = document.getElementById(graphId);
+
+        // Stop updating once the graph has been removed (e.g. by changing tabs).
+        if (!container) {
+          sources[graphId].close();
+          delete sources[graphId];
+          return;
+        }
+
+        const graph = container.getElementsByClassName("js-plotly-plot")[0];
+
+        if (x.length === 0 || columns.length === 0 || !graph) {
+          return;
+        }
+
+        Plotly.extendTraces(
+          graph,
+          {
+            x: columns.map(() => x),
+            y: columns.map((column) =>
+              data.y[column].filter((_, i) => isNew[i])
+            ),
+          },
+          columns.map((column) => liveState.trace_indices[column]),
+          liveState.max_points
+        );
+
+        lastDatetime = data.last_datetime;
+      };
+
+      const pollForData = function () {
+        const timer = setInterval(function () {
+          fetch("/live-data/recent?" + getQueryString())
+            .then((response) => (response.ok ? response.json() : []))
+            .then((messages) => {
+              if (sources[graphId] === poller) {
+                messages.forEach(addData);
+              }
+            })
+            .catch(() => {});
+        }, liveState.update_interval * 1000);
+
+        const poller = { close: () => clearInterval(timer) };
+        sources[graphId] = poller;
+
+        const status = document.getElementById(graphId + "-live-status");
+
+        if (status) {
+          status.textContent = "Live data connected (polling).";
+        }
+      };
+
+      const source = new EventSource("/live-data?" + getQueryString());
+
+      source.onmessage = function (event) {
+        addData(JSON.parse(event.data));
+      };
+
+      // `EventSource` reconnects by itself after network errors but gives up if the server responds with an error
+      // status (e.g. 503 when it has too many live viewers).
+      source.onerror = function () {
+        if (
+          source.readyState === EventSource.CLOSED &&
+          sources[graphId] === source
+        ) {
+          pollForData();
+        }
+      };
+
+      sources[graphId] = source;
+      return "Live data connected.";
+    },
+  },
+});
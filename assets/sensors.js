@@ -0,0 +1,32 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  sensors: {
+    /**
+     * Replace the overview plotted in a sensors graph with the full resolution figure once it's ready. The figure is
+     * ignored if the graph has been replotted for a different query in the meantime.
+     *
+     * @param {Object} refined - the full resolution figure, the data limit warning, and the query behind the figure
+     * @param {Object} refinement - the query behind the overview currently plotted, if it's waiting to be refined
+     * @returns {Array} the figure, the data limit warning, and the query behind the plotted data
+     */
+    showRefinedFigure: function (refined, refinement) {
+      const noUpdate = window.dash_clientside.no_update;
+      const queryKeys = [
+        "installation_reference",
+        "node_id",
+        "sensor_name",
+        "start",
+        "finish",
+      ];
+
+      if (
+        !refined ||
+        !refinement ||
+        queryKeys.some((key) => refined.query[key] !== refinement[key])
+      ) {
+        return [noUpdate, noUpdate, noUpdate];
+      }
+
+      return [refined.figure, refined.warning, refined.query];
+    },
+  },
+});
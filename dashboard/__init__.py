@@ -0,0 +1,5 @@
+import time
+
+
+# Recorded first so the startup timing report can show how long importing the dashboard (and its dependencies) takes.
+IMPORT_START_TIME = time.perf_counter()
@@ -1,17 +1,98 @@
+import datetime as dt
+import functools
 import logging
+import os
+import threading
+import time
 
 import dash
+import flask
 from dash import html
 from flask_caching import Cache
 
-from aerosense_tools.queries import BigQuery
+from dashboard import IMPORT_START_TIME
 from dashboard.callbacks import register_callbacks
+from dashboard.compression import compress_response
+from dashboard.data_cache import ArrowDataCache, SharedArrowDataCache
 from dashboard.layouts import create_cp_plot_tab_layout, create_sensors_tab_layout
+from dashboard.queries import BigQueryClientFactory
+from dashboard.reference_data import ReferenceData
+
+
+logger = logging.getLogger(__name__)
 
 
-EXCLUDED_SENSORS = {"microphone", "connection_statistics", "battery_info"}
 CACHE_TIMEOUT = 3600
 
+# Set `CACHE_TYPE` to a shared Flask-Caching backend (e.g. "RedisCache" with `CACHE_REDIS_URL`, or "MemcachedCache" with
+# `CACHE_MEMCACHED_SERVERS`) to share cached data between gunicorn workers and Cloud Run instances. Their clients are
+# installed with the "redis" and "memcached" extras. Memcached's default 1 MB item size limit is too small for most
+# cached sensor data, so its servers should be started with a bigger one (e.g. `memcached -I 64m`).
+CACHE_CONFIG = {
+    "CACHE_TYPE": os.environ.get("CACHE_TYPE", "filesystem"),
+    "CACHE_DIR": ".dashboard_cache",
+    "CACHE_REDIS_URL": os.environ.get("CACHE_REDIS_URL"),
+    "CACHE_MEMCACHED_SERVERS": (
+        os.environ["CACHE_MEMCACHED_SERVERS"].split(",") if "CACHE_MEMCACHED_SERVERS" in os.environ else None
+    ),
+}
+
+# Sensor data is cached as Arrow files on local disk when the cache isn't shared.
+LOCAL_CACHE_TYPES = {"filesystem", "FileSystemCache", "flask_caching.backends.FileSystemCache"}
+
+# The maximum total size in bytes of the sensor data cached on disk.
+DATA_CACHE_MAX_SIZE = int(os.environ.get("DATA_CACHE_MAX_SIZE", 2 * 1024**3))
+
+# The maximum total size in bytes of the Cp plot's pressure data time windows cached on disk.
+PRESSURE_CACHE_MAX_SIZE = int(os.environ.get("PRESSURE_CACHE_MAX_SIZE", 512 * 1024**2))
+
+# The number of seconds after a chunk of sensor data ends before its data is assumed to be complete and it's cached.
+CHUNK_SETTLING_TIME = int(os.environ.get("CHUNK_SETTLING_TIME", 10 * 60))
+
+# The number of seconds to cache each chunk of sensor data for before querying it again, so data uploaded late (e.g.
+# after a gateway loses its connection) shows up. Set to 0 to cache chunks until they're evicted.
+CHUNK_LIFETIME = int(os.environ.get("CHUNK_LIFETIME", 24 * 60 * 60))
+
+# The maximum number of points sent to the browser for each trace of the sensor graphs.
+MAX_POINTS_PER_TRACE = int(os.environ.get("MAX_POINTS_PER_TRACE", 5000))
+
+# The number of points above which the sensor graphs are drawn with WebGL instead of SVG.
+WEBGL_POINT_THRESHOLD = int(os.environ.get("WEBGL_POINT_THRESHOLD", 20000))
+
+# The gzip compression level (from 1 to 9) of the server's responses, or 0 to not compress them.
+RESPONSE_COMPRESSION_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_LEVEL", 6))
+
+# The maximum number of rows of a time window too big to download in one go that are streamed from BigQuery and
+# aggregated by the dashboard instead of being aggregated by BigQuery. Set to 0 to always aggregate in BigQuery.
+STREAMING_ROW_LIMIT = int(os.environ.get("STREAMING_ROW_LIMIT", 0))
+
+# Set to "false" to query the sensor data of all of an installation's nodes together when no node is selected instead of
+# querying each node in parallel.
+QUERY_NODES_IN_PARALLEL = os.environ.get("QUERY_NODES_IN_PARALLEL", "true").lower() == "true"
+
+# Set to "false" to wait for the full resolution sensor data before plotting it instead of plotting a coarse overview of
+# it in the meantime.
+PROGRESSIVE_RENDERING = os.environ.get("PROGRESSIVE_RENDERING", "true").lower() == "true"
+
+# The maximum number of live sensors graphs each process streams new data to at once. Each stream holds one of the
+# process's threads, so by default half of them (`GUNICORN_THREADS`) are left for other requests. Live graphs opened
+# once the limit is reached poll for new data instead.
+LIVE_DATA_MAX_SUBSCRIBERS = int(
+    os.environ.get("LIVE_DATA_MAX_SUBSCRIBERS", max(int(os.environ.get("GUNICORN_THREADS", 8)) // 2, 1))
+)
+
+# Set to "true" to store sensor data as 32-bit floats and categoricals as soon as it's downloaded, roughly halving the
+# memory and cache space it uses.
+COMPACT_SENSOR_DATA = os.environ.get("COMPACT_SENSOR_DATA", "false").lower() == "true"
+
+# The maximum number of HTTP connections each process keeps open to BigQuery. This should be at least the number of
+# threads serving requests plus the threads querying nodes and chunks in parallel (see `dashboard.callbacks`).
+BIGQUERY_MAX_CONNECTIONS = int(os.environ.get("BIGQUERY_MAX_CONNECTIONS", 32))
+
+# Set to "false" to create a new BigQuery Storage read client for each download of the dashboard's own queries instead of
+# sharing one. Queries inherited from `aerosense-tools` always create their own.
+BIGQUERY_REUSE_STORAGE_CLIENT = os.environ.get("BIGQUERY_REUSE_STORAGE_CLIENT", "true").lower() == "true"
+
 app = dash.Dash(
     name=__name__,
     assets_folder="../assets",
@@ -22,9 +103,21 @@ app.config.suppress_callback_exceptions = True
 app.logger.setLevel(logging.DEBUG)
 
 server = app.server
-cache = Cache(server, config={"CACHE_TYPE": "filesystem", "CACHE_DIR": ".dashboard_cache"})
+cache = Cache(server, config=CACHE_CONFIG)
 
-SENSOR_TYPES = cache.memoize(timeout=CACHE_TIMEOUT)(BigQuery().get_sensor_types)()
+if CACHE_CONFIG["CACHE_TYPE"] in LOCAL_CACHE_TYPES:
+    data_cache = ArrowDataCache(directory=".dashboard_data_cache", max_size=DATA_CACHE_MAX_SIZE)
+    pressure_cache = ArrowDataCache(directory=".dashboard_pressure_cache", max_size=PRESSURE_CACHE_MAX_SIZE)
+else:
+    data_cache = SharedArrowDataCache(cache)
+    pressure_cache = SharedArrowDataCache(cache, prefix="pressure:")
+
+bigquery_factory = BigQueryClientFactory(
+    max_connections=BIGQUERY_MAX_CONNECTIONS,
+    reuse_bqstorage_client=BIGQUERY_REUSE_STORAGE_CLIENT,
+)
+
+reference_data = ReferenceData(cache, timeout=CACHE_TIMEOUT, bigquery_factory=bigquery_factory)
 
 tabs = {
     "information_sensors": create_sensors_tab_layout(
@@ -37,9 +130,11 @@ tabs = {
     "sensors": create_sensors_tab_layout(
         app,
         tab_name="sensors",
-        sensor_names=[sensor for sensor in SENSOR_TYPES if sensor not in EXCLUDED_SENSORS],
+        sensor_names=None,
         graph_id="sensors-graph",
         data_limit_warning_id="sensor-data-limit-warning",
+        live_mode=True,
+        progressive_rendering=True,
     ),
     "cp_plot": create_cp_plot_tab_layout(app),
 }
@@ -50,7 +145,45 @@ app.layout = html.Div(
     style={"height": "100vh"},
 )
 
-register_callbacks(app, cache=cache, cache_timeout=CACHE_TIMEOUT, tabs=tabs, sensor_types=SENSOR_TYPES)
+register_callbacks(
+    app,
+    cache=cache,
+    data_cache=data_cache,
+    pressure_cache=pressure_cache,
+    cache_timeout=CACHE_TIMEOUT,
+    tabs=tabs,
+    reference_data=reference_data,
+    bigquery_factory=bigquery_factory,
+    max_points_per_trace=MAX_POINTS_PER_TRACE,
+    compact_sensor_data=COMPACT_SENSOR_DATA,
+    webgl_point_threshold=WEBGL_POINT_THRESHOLD,
+    streaming_row_limit=STREAMING_ROW_LIMIT,
+    query_nodes_in_parallel=QUERY_NODES_IN_PARALLEL,
+    progressive_rendering=PROGRESSIVE_RENDERING,
+    max_live_subscribers=LIVE_DATA_MAX_SUBSCRIBERS,
+    chunk_settling_time=dt.timedelta(seconds=CHUNK_SETTLING_TIME),
+    chunk_lifetime=dt.timedelta(seconds=CHUNK_LIFETIME) if CHUNK_LIFETIME else None,
+)
+
+
+@server.route("/cache-stats")
+def get_cache_stats():
+    """Get the hit, miss and eviction counts of this process's data caches.
+
+    :return flask.Response:
+    """
+    return flask.jsonify({"sensor_data": data_cache.stats(), "pressure_data": pressure_cache.stats()})
+
+
+# Compress the callback responses (mostly figures) and other text sent to the browser.
+if RESPONSE_COMPRESSION_LEVEL:
+    server.after_request(functools.partial(compress_response, compression_level=RESPONSE_COMPRESSION_LEVEL))
+
+
+# Load the reference data in the background so the app can start serving straight away.
+threading.Thread(target=reference_data.warm, daemon=True).start()
+
+logger.info("Imported the dashboard in %.2fs.", time.perf_counter() - IMPORT_START_TIME)
 
 
 # Run the Dash app
@@ -2,205 +2,1343 @@ import datetime
 import datetime as dt
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import flask
+import numpy as np
+import pandas as pd
 import plotly.express as px
 import requests
-from dash import Input, Output, State
+from dash import ClientsideFunction, Input, Output, State, ctx, no_update
 from dash.exceptions import PreventUpdate
 
-from aerosense_tools.plots import plot_connection_statistic, plot_cp_curve, plot_sensors
+from aerosense_tools.plots import plot_connection_statistic, plot_sensors
 from aerosense_tools.preprocess import RawSignal, SensorMeasurementSession
-from aerosense_tools.queries import ROW_LIMIT, BigQuery
-from dashboard.utils import generate_time_range
+from aerosense_tools.queries import ROW_LIMIT
+from dashboard.chunked_cache import ChunkedDataCache, combine_chunks, get_chunk_duration, get_chunks
+from dashboard.coalescing import SingleFlight, memoize_coalesced
+from dashboard.compaction import compact_dataframe, log_memory_report
+from dashboard.cp import (
+    compute_cp,
+    create_cp_envelope_figure,
+    create_cp_figure,
+    create_cp_heatmap_figure,
+    get_mean_per_second,
+)
+from dashboard.data_cache import DataFrameResultStore
+from dashboard.downsampling import downsample_dataframe, downsample_figure, get_envelope
+from dashboard.figures import combine_node_figures, remove_redundant_hover_data, use_epoch_milliseconds, use_webgl
+from dashboard.live import LiveDataHub, create_live_data_response, create_recent_live_data_response
+from dashboard.queries import DEFAULT_NUMBER_OF_BUCKETS
+from dashboard.utils import generate_time_range, get_x_axis_range, is_x_axis_reset
 
 
 logger = logging.getLogger(__name__)
 
 
+EXCLUDED_SENSORS = {"microphone", "connection_statistics", "battery_info"}
+
 SESSIONS_EXTRACTION_CLOUD_FUNCTION_URL = (
     "https://europe-west6-aerosense-twined.cloudfunctions.net/data-gateway-sessions"
 )
 
 
-def register_callbacks(app, cache, cache_timeout, tabs, sensor_types):
+# The length of the time window plotted when the sensors tab's live mode is turned on.
+LIVE_WINDOW_DURATION = dt.timedelta(minutes=1)
+
+# The number of seconds between checks for new data for each live data stream.
+LIVE_UPDATE_INTERVAL = 3
+
+# The minimum number of points each trace of the live sensors graph keeps before dropping its oldest points.
+LIVE_MINIMUM_POINTS = 100
+
+# The length of the time window the Cp plot's time slider moves through.
+CP_TIME_WINDOW_SECONDS = 60
+
+# Pressure data for the next chunk of Cp playback frames is loaded into the cache in the background by these threads.
+CP_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cp-prefetch")
+
+# The number of time buckets the overview plotted while the full resolution sensor data is being got is aggregated into.
+OVERVIEW_NUMBER_OF_BUCKETS = 250
+
+# Time windows up to this long are always plotted at full resolution straight away rather than as an overview first.
+OVERVIEW_MINIMUM_DURATION = dt.timedelta(hours=1)
+
+# An overview of a time window split into chunks is only plotted first if more than this fraction of it is missing from
+# the chunk cache.
+OVERVIEW_MINIMUM_MISSING_FRACTION = 0.25
+
+# When no node is selected, each node's sensor data is queried in parallel by these threads.
+NODE_QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="node-query")
+
+# The chunks of sensor data missing from the cache are queried in parallel by these threads.
+CHUNK_QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chunk-query")
+
+# Identical queries made concurrently by different threads of this process are only run once.
+SINGLE_FLIGHT = SingleFlight()
+
+
+def register_callbacks(
+    app,
+    cache,
+    data_cache,
+    pressure_cache,
+    cache_timeout,
+    tabs,
+    reference_data,
+    bigquery_factory,
+    max_points_per_trace=None,
+    compact_sensor_data=False,
+    webgl_point_threshold=None,
+    streaming_row_limit=0,
+    query_nodes_in_parallel=False,
+    progressive_rendering=False,
+    max_live_subscribers=None,
+    chunk_settling_time=dt.timedelta(minutes=10),
+    chunk_lifetime=dt.timedelta(days=1),
+):
     """Register the dashboards callbacks with the app.
 
     :param dash.Dash app:
     :param flask_caching.Cache cache:
+    :param dashboard.data_cache.ArrowDataCache|dashboard.data_cache.SharedArrowDataCache data_cache: the cache for sensor data (both chunks and whole time windows)
+    :param dashboard.data_cache.ArrowDataCache|dashboard.data_cache.SharedArrowDataCache pressure_cache: the cache for the Cp plot's pressure data time windows
     :param int|float cache_timeout:
     :param dict tabs:
-    :param dict sensor_types:
+    :param dashboard.reference_data.ReferenceData reference_data:
+    :param dashboard.queries.BigQueryClientFactory bigquery_factory: the factory for the shared BigQuery client
+    :param int|None max_points_per_trace: if given, downsample each trace of the sensor graphs to about this many points
+    :param bool compact_sensor_data: if `True`, store sensor data as 32-bit floats and categoricals as soon as it's downloaded (see `dashboard.compaction.compact_dataframe`)
+    :param int|None webgl_point_threshold: if given, draw sensor graphs with more than this many points with WebGL instead of SVG
+    :param int streaming_row_limit: the maximum number of rows of a time window too big to download in one go that are streamed and aggregated by the dashboard (see `dashboard.queries.BigQuery.stream_aggregated_sensor_data`) rather than aggregated by BigQuery
+    :param bool query_nodes_in_parallel: if `True`, query each node's sensor data in parallel when no node is selected and plot it as separate traces
+    :param bool progressive_rendering: if `True`, plot a coarse overview of the sensor data while it's being got at full resolution
+    :param int|None max_live_subscribers: if given, the maximum number of live sensors graphs the process streams new data to at once; any more poll for it instead
+    :param datetime.timedelta chunk_settling_time: how long after a chunk of sensor data ends its data is assumed to be complete and can be cached (see `dashboard.chunked_cache.ChunkedDataCache`)
+    :param datetime.timedelta|None chunk_lifetime: how long to cache each chunk of sensor data for (`None` means until it's evicted)
     :return None:
     """
+    # Each aggregation bucket is plotted as two points (its minimum and maximum).
+    number_of_buckets = max_points_per_trace // 2 if max_points_per_trace else DEFAULT_NUMBER_OF_BUCKETS
+    chunked_data_cache = ChunkedDataCache(data_cache, settling_time=chunk_settling_time, lifetime=chunk_lifetime)
+
+    # Whole time windows of sensor data are kept in the size-capped data cache alongside its chunks rather than pickled
+    # into the general cache.
+    result_store = DataFrameResultStore(data_cache)
+
+    def ends_within_settling_time(installation_reference, node_id, sensor_name, start, finish):
+        """Check whether a time window ends too recently for its data to be complete. The sensor data for such windows
+        (e.g. "Last hour" windows, which end when they're requested) isn't memoized, as it may still change and its
+        windows are rarely requested again; its settled chunks are cached by the chunk cache instead.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return bool:
+        """
+        return finish > dt.datetime.utcnow() - chunked_data_cache.settling_time
+
+    # Only the data is cached, keyed on the query parameters. The figures are rebuilt from the cached data on every
+    # callback so changing a display-only parameter (e.g. the Cp axis limits) never causes another query.
+
+    def compact(df, description=None):
+        """If compaction is enabled, convert the sensor data to its compact representation (see
+        `dashboard.compaction.compact_dataframe`).
+
+        :param pandas.DataFrame df:
+        :param str|None description: if given, log how much memory compacting the data saved using this description of the data
+        :return pandas.DataFrame:
+        """
+        if not compact_sensor_data or df.empty:
+            return df
+
+        compacted_df = compact_dataframe(df)
+
+        if description:
+            log_memory_report(df, compacted_df, description)
+
+        return compacted_df
+
+    def query_sensor_data(installation_reference, node_id, sensor_name, start, finish):
+        """Query the sensor data for the given node during the given time window. If the window contains more rows than
+        the row limit, the minimum and maximum of the data over time buckets are queried instead (see
+        `dashboard.downsampling.get_envelope`) so the whole window is shown without holding every row in memory. These
+        are calculated by BigQuery or, if the window has at most `streaming_row_limit` rows, from the raw rows as
+        they're streamed from BigQuery.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (pandas.DataFrame, datetime.timedelta|None): the data and the duration of the aggregation buckets (`None` if the data isn't aggregated)
+        """
+        bigquery = _get_bigquery(bigquery_factory)
+        chunk_duration = get_chunk_duration(start, finish)
+
+        if chunk_duration is not None:
+            df = query_chunked_sensor_data(installation_reference, node_id, sensor_name, start, finish, chunk_duration)
+
+            if df is not None:
+                return df, None
+
+        number_of_rows, first_datetime, last_datetime = bigquery.get_sensor_data_summary(
+            installation_reference,
+            node_id,
+            sensor_name,
+            start=start,
+            finish=finish,
+        )
+
+        if number_of_rows == 0:
+            return pd.DataFrame(), None
+
+        if number_of_rows <= ROW_LIMIT:
+            df, _ = bigquery.get_sensor_data(
+                installation_reference,
+                node_id,
+                sensor_name,
+                start=start,
+                finish=finish,
+            )
+
+            return compact(df, description=f"{sensor_name!r} data"), None
+
+        # Windows that aren't too big are streamed and aggregated here rather than aggregated by BigQuery.
+        if number_of_rows <= streaming_row_limit:
+            aggregate_sensor_data = bigquery.stream_aggregated_sensor_data
+        else:
+            aggregate_sensor_data = bigquery.get_aggregated_sensor_data
+
+        aggregated_df, bucket_duration = aggregate_sensor_data(
+            installation_reference,
+            node_id,
+            sensor_name,
+            number_of_data_columns=len(reference_data.get_sensor_types()[sensor_name]["sensors"]),
+            start=first_datetime,
+            finish=last_datetime,
+            number_of_buckets=number_of_buckets,
+        )
+
+        aggregated_df = compact(aggregated_df, description=f"aggregated {sensor_name!r} data")
+        return get_envelope(aggregated_df, bucket_duration), bucket_duration
+
+    def query_chunked_sensor_data(installation_reference, node_id, sensor_name, start, finish, chunk_duration):
+        """Query the raw sensor data for the given node during the given time window, reusing any cached chunks of it
+        and only querying the chunks missing from the cache (usually just the most recent ones).
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param datetime.timedelta chunk_duration:
+        :return pandas.DataFrame|None: the data, or `None` if the time window contains more rows than the row limit
+        """
+        bigquery = _get_bigquery(bigquery_factory)
+        key = {"installation_reference": installation_reference, "node_id": node_id, "sensor_type": sensor_name}
+        chunks, missing_time_ranges = chunked_data_cache.get(key, start, finish, chunk_duration)
+
+        # The missing time ranges exclude their finish but BigQuery's `BETWEEN` includes it.
+        missing_time_ranges = [
+            (range_start, range_finish, range_finish - dt.timedelta(microseconds=1))
+            for range_start, range_finish in missing_time_ranges
+        ]
+
+        def count_rows(time_range):
+            range_start, _, inclusive_range_finish = time_range
+
+            return bigquery.get_sensor_data_summary(
+                installation_reference,
+                node_id,
+                sensor_name,
+                start=range_start,
+                finish=inclusive_range_finish,
+            )[0]
+
+        def download(time_range):
+            range_start, _, inclusive_range_finish = time_range
+
+            return bigquery.get_sensor_data(
+                installation_reference,
+                node_id,
+                sensor_name,
+                start=range_start,
+                finish=inclusive_range_finish,
+            )
+
+        # The missing chunks are counted and then downloaded in parallel.
+        number_of_rows = sum(len(chunk) for chunk in chunks)
+        number_of_rows += sum(CHUNK_QUERY_EXECUTOR.map(count_rows, missing_time_ranges))
+
+        if number_of_rows > ROW_LIMIT:
+            return None
+
+        downloads = CHUNK_QUERY_EXECUTOR.map(download, missing_time_ranges)
+
+        for (range_start, range_finish, _), (df, data_limit_applied) in zip(missing_time_ranges, downloads):
+            df = compact(df, description=f"{sensor_name!r} data")
+
+            if not data_limit_applied:
+                chunked_data_cache.set(key, df, range_start, range_finish, chunk_duration)
+
+            chunks.append(df)
+
+        # Combining chunks can turn the categorical columns back into objects.
+        return compact(combine_chunks(chunks, start, finish))
+
+    @memoize_coalesced(cache, timeout=cache_timeout, store=result_store, unless=ends_within_settling_time)
+    def get_information_sensor_data(installation_reference, node_id, sensor_name, start, finish):
+        """Get the information sensor data for the given node during the given time window. All the connection
+        statistics come from the same table, so they're queried (and cached) together.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name: "battery_info" or "connection_statistics"
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (pandas.DataFrame, datetime.timedelta|None): the data and the duration of the aggregation buckets (`None` if the data isn't aggregated)
+        """
+        if sensor_name == "battery_info":
+            return query_sensor_data(installation_reference, node_id, sensor_name, start, finish)
+
+        df = _get_bigquery(bigquery_factory).get_aggregated_connection_statistics(
+            installation_reference=installation_reference,
+            node_id=node_id,
+            start=start,
+            finish=finish,
+        )
+
+        return df, None
+
+    @memoize_coalesced(cache, timeout=cache_timeout, store=result_store, unless=ends_within_settling_time)
+    def get_sensor_data(installation_reference, node_id, sensor_name, start, finish):
+        """Get the sensor data for the given node during the given time window, converted to its physical variables
+        and indexed by datetime.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (pandas.DataFrame, datetime.timedelta|None): the data and the duration of the aggregation buckets (`None` if the data isn't aggregated)
+        """
+        df, bucket_duration = query_sensor_data(installation_reference, node_id, sensor_name, start, finish)
+
+        if df.empty:
+            return df, bucket_duration
+
+        chunk_duration = get_chunk_duration(start, finish)
+
+        if bucket_duration is None and chunk_duration is not None:
+            df = preprocess_sensor_data_in_chunks(
+                df,
+                installation_reference,
+                node_id,
+                sensor_name,
+                start,
+                finish,
+                chunk_duration,
+            )
+
+            return df, bucket_duration
+
+        # Gaps in aggregated data are already marked by `get_envelope`.
+        return preprocess_sensor_data(df, sensor_name, pad_gaps=bucket_duration is None), bucket_duration
+
+    def forget_sensor_data(memoized_function, installation_reference, node_ids, sensor_name, start, finish):
+        """Remove the memoized sensor data for each of the given nodes during the given time window along with its
+        cached raw and preprocessed chunks, so it's all queried again (e.g. to pick up data uploaded late when the
+        refresh button is clicked).
+
+        :param callable memoized_function: `get_sensor_data` or `get_information_sensor_data`
+        :param str installation_reference:
+        :param list(str|None) node_ids:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return None:
+        """
+        chunk_duration = get_chunk_duration(start, finish)
+
+        for node_id in node_ids:
+            memoized_function.invalidate(installation_reference, node_id, sensor_name, start, finish)
+
+            if chunk_duration is None:
+                continue
+
+            key = {"installation_reference": installation_reference, "node_id": node_id, "sensor_type": sensor_name}
+            chunked_data_cache.delete(key, start, finish, chunk_duration)
+            chunked_data_cache.delete({**key, "stage": "preprocessed"}, start, finish, chunk_duration)
+
+    def get_node_summaries(installation_reference, node_id, sensor_name, start, finish):
+        """Get the number of rows of sensor data and the datetimes of the first and last rows for each node to plot
+        during the given time window. If no node is given and nodes are queried in parallel, these are the nodes of the
+        installation that have data during the window, summarised in a single query; otherwise, it's just the given
+        node (or all nodes together, keyed by `None`).
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return dict(str|None, (int, datetime.datetime, datetime.datetime)): the number of rows and the first and last datetimes for each node with data during the time window
+        """
+        bigquery = _get_bigquery(bigquery_factory)
+
+        if node_id is None and query_nodes_in_parallel:
+            return bigquery.get_sensor_data_summary_by_node(
+                installation_reference, sensor_name, start=start, finish=finish
+            )
+
+        summary = bigquery.get_sensor_data_summary(
+            installation_reference, node_id, sensor_name, start=start, finish=finish
+        )
+
+        if summary[0] == 0:
+            return {}
+
+        return {node_id: summary}
+
+    def get_sensor_data_by_node(installation_reference, node_ids, sensor_name, start, finish):
+        """Get the sensor data for each of the given nodes during the given time window (see `get_sensor_data`). If
+        there are several nodes, each node's data is queried (and cached) separately on a bounded thread pool so the data
+        for the whole installation takes about as long to get as that of the slowest node.
+
+        :param str installation_reference:
+        :param list(str|None) node_ids: the nodes to get the data of (see `get_node_summaries`)
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (dict(str|None, pandas.DataFrame), datetime.timedelta|None): the non-empty data for each node (or all nodes together, keyed by `None`) and the longest duration of the aggregation buckets (`None` if none of the data is aggregated)
+        """
+        if len(node_ids) <= 1:
+            results = {
+                node_id: get_sensor_data(installation_reference, node_id, sensor_name, start, finish)
+                for node_id in node_ids
+            }
+
+        else:
+            futures = {
+                node_id: NODE_QUERY_EXECUTOR.submit(
+                    get_sensor_data,
+                    installation_reference,
+                    node_id,
+                    sensor_name,
+                    start,
+                    finish,
+                )
+                for node_id in node_ids
+            }
+
+            results = {node_id: future.result() for node_id, future in futures.items()}
+
+        data = {node_id: df for node_id, (df, _) in results.items() if not df.empty}
+        bucket_durations = [bucket_duration for _, bucket_duration in results.values() if bucket_duration is not None]
+        return data, max(bucket_durations, default=None)
+
+    def is_slow_to_get(installation_reference, node_id, sensor_name, start, finish, number_of_rows):
+        """Check whether getting the full resolution sensor data for the given node during the given time window is
+        likely to be slow enough for an overview to be worth plotting first. Short windows and windows that are already
+        cached aren't, and nor are windows aggregated by BigQuery, as that takes about as long as the overview's own
+        query. Windows streamed from BigQuery and aggregated here are, as are raw windows unless most of their chunks
+        are already cached.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param int number_of_rows: the number of rows of data the node has during the time window
+        :return bool:
+        """
+        if finish - start <= OVERVIEW_MINIMUM_DURATION:
+            return False
+
+        if get_sensor_data.get_cached(installation_reference, node_id, sensor_name, start, finish) is not None:
+            return False
+
+        if number_of_rows > ROW_LIMIT:
+            return number_of_rows <= streaming_row_limit
+
+        chunk_duration = get_chunk_duration(start, finish)
+
+        if chunk_duration is None:
+            return True
+
+        key = {"installation_reference": installation_reference, "node_id": node_id, "sensor_type": sensor_name}
+        missing_time_ranges = chunked_data_cache.get_missing_time_ranges(key, start, finish, chunk_duration)
+        missing_duration = sum(
+            (range_finish - range_start for range_start, range_finish in missing_time_ranges), dt.timedelta()
+        )
+        return missing_duration > OVERVIEW_MINIMUM_MISSING_FRACTION * (finish - start)
+
+    @memoize_coalesced(cache, timeout=cache_timeout)
+    def get_sensor_data_overview(installation_reference, node_id, sensor_name, start, finish):
+        """Get a coarse overview of the sensor data for the given node during the given time window - the minimum and
+        maximum of the data over a small number of time buckets, aggregated by BigQuery in a single cheap query. This is
+        plotted while the full resolution data is being got. The time window should be that spanned by the data (see
+        `get_node_summaries`) so the buckets are sized to the data rather than to the window requested.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (dict(str|None, pandas.DataFrame), datetime.timedelta): the non-empty preprocessed data for each node (keyed in the same way as by `get_sensor_data_by_node`) and the duration of the aggregation buckets
+        """
+        aggregated_df, bucket_duration = _get_bigquery(bigquery_factory).get_aggregated_sensor_data(
+            installation_reference,
+            node_id,
+            sensor_name,
+            number_of_data_columns=len(reference_data.get_sensor_types()[sensor_name]["sensors"]),
+            start=start,
+            finish=finish,
+            number_of_buckets=OVERVIEW_NUMBER_OF_BUCKETS,
+        )
+
+        if aggregated_df.empty:
+            return {}, bucket_duration
+
+        if node_id is None and query_nodes_in_parallel:
+            aggregated_data = dict(tuple(aggregated_df.groupby("node_id", sort=True, observed=True)))
+        else:
+            aggregated_data = {node_id: aggregated_df}
+
+        data = {
+            node_id: preprocess_sensor_data(get_envelope(df, bucket_duration), sensor_name, pad_gaps=False)
+            for node_id, df in aggregated_data.items()
+        }
+
+        return data, bucket_duration
+
+    def preprocess_sensor_data_in_chunks(
+        df, installation_reference, node_id, sensor_name, start, finish, chunk_duration
+    ):
+        """Preprocess raw sensor data for a time window chunk by chunk, reusing any preprocessed chunks in the cache and
+        only preprocessing the rest (usually just the most recent ones). Each run of missing chunks is preprocessed with
+        the raw rows either side of it so gaps at its boundaries are found as if the whole window were preprocessed at
+        once. Only whole, settled chunks are cached.
+
+        :param pandas.DataFrame df: the raw sensor data for the time window, sorted by datetime
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_name:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param datetime.timedelta chunk_duration:
+        :return pandas.DataFrame: the preprocessed data, indexed by datetime
+        """
+        key = {
+            "installation_reference": installation_reference,
+            "node_id": node_id,
+            "sensor_type": sensor_name,
+            "stage": "preprocessed",
+        }
+
+        cached_chunks, missing_time_ranges = chunked_data_cache.get(key, start, finish, chunk_duration)
+        processed_chunks = [chunk.set_index("datetime") for chunk in cached_chunks if not chunk.empty]
+        datetimes = df["datetime"].to_numpy()
+
+        for range_start, range_finish in missing_time_ranges:
+            first, last = np.searchsorted(datetimes, np.array([range_start, range_finish], dtype="datetime64[ns]"))
+
+            if first == last:
+                continue
+
+            # Include the rows either side of the time range so gaps at its boundaries are found.
+            first_with_overlap = max(first - 1, 0)
+            last_with_overlap = last + 1
+            processed_data = preprocess_sensor_data(df.iloc[first_with_overlap:last_with_overlap], sensor_name)
+
+            processed_data = processed_data[
+                (processed_data.index >= range_start) & (processed_data.index < range_finish)
+            ]
+
+            processed_chunks.append(processed_data)
+
+            # The first and last chunks of the window may be missing rows from outside it so aren't cached.
+            whole_chunks = [
+                (chunk_start, chunk_finish)
+                for chunk_start, chunk_finish in get_chunks(range_start, range_finish - chunk_duration, chunk_duration)
+                if chunk_start > start and chunk_finish < finish
+            ]
+
+            if whole_chunks:
+                chunked_data_cache.set(
+                    key,
+                    processed_data.rename_axis("datetime").reset_index(),
+                    whole_chunks[0][0],
+                    whole_chunks[-1][1],
+                    chunk_duration,
+                )
+
+        logger.debug(
+            "Preprocessed %d time ranges of %r data and reused %d preprocessed chunks.",
+            len(missing_time_ranges),
+            sensor_name,
+            len(cached_chunks),
+        )
+
+        processed_data = pd.concat(processed_chunks).sort_index(kind="stable")
+        return processed_data[(processed_data.index >= start) & (processed_data.index <= finish)]
+
+    def preprocess_sensor_data(df, sensor_name, pad_gaps=True):
+        """Convert raw sensor data to its physical variables, indexed by datetime with a column per sensor.
+
+        :param pandas.DataFrame df: the raw sensor data
+        :param str sensor_name:
+        :param bool pad_gaps: if `True`, mark gaps in the data with missing values so they're shown in plots
+        :return pandas.DataFrame:
+        """
+        # Extract only data columns and set index to 'datetime', so that DataFrame is accepted by RawSignal class
+        data_columns = df.columns[df.columns.str.startswith("f")].tolist()
+        sensor_data = df[["datetime"] + data_columns].set_index("datetime")
+        sensor_data.columns = reference_data.get_sensor_types()[sensor_name]["sensors"]
+        # Use pre-process library
+        raw_data = RawSignal(sensor_data, sensor_name)
+
+        if pad_gaps:
+            raw_data.pad_gaps()
+
+        raw_data.measurement_to_variable()
+        return compact(raw_data.dataframe)
+
+    def get_pressure_data_for_time_window(installation_reference, node_id, start_datetime, finish_datetime):
+        """Get pressure data for the given node during the given time window. The data for each window is kept in the
+        pressure cache until it's evicted to keep the cache within its size limit.
+
+        :param str installation_reference:
+        :param str node_id:
+        :param datetime.datetime start_datetime:
+        :param datetime.datetime finish_datetime:
+        :return pandas.DataFrame: the raw barometer data for the time window, sorted by datetime
+        """
+        key = f"pressure:{installation_reference}:{node_id}:{start_datetime.isoformat()}:{finish_datetime.isoformat()}"
+        df = pressure_cache.get(key)
+
+        if df is not None:
+            return df
+
+        df, _ = _get_bigquery(bigquery_factory).get_sensor_data(
+            installation_reference=installation_reference,
+            node_id=node_id,
+            sensor_type_reference="barometer",
+            start=start_datetime,
+            finish=finish_datetime,
+        )
+
+        logger.info(
+            "Downloaded pressure data %d second time window for start datetime %r and finish datetime %r.",
+            (finish_datetime - start_datetime).seconds,
+            start_datetime.isoformat(),
+            finish_datetime.isoformat(),
+        )
+
+        df = compact(df, description="pressure data")
+
+        # Store the window sorted by time so each second of it can be selected by binary search.
+        if not df.empty and not df["datetime"].is_monotonic_increasing:
+            df = df.sort_values("datetime", kind="stable", ignore_index=True)
+
+        pressure_cache.set(
+            key,
+            df,
+            metadata={
+                "installation_reference": installation_reference,
+                "node_id": node_id,
+                "start": start_datetime.isoformat(),
+                "finish": finish_datetime.isoformat(),
+            },
+        )
+
+        return df
+
+    def plot_information_sensor_data(df, y_axis_column):
+        """Plot the given information sensor data.
+
+        :param pandas.DataFrame df:
+        :param str y_axis_column:
+        :return plotly.graph_objs.Figure:
+        """
+        # Only the rows worth plotting are passed on so the figure is never built from all of them.
+        if y_axis_column == "battery_info":
+            df = downsample_dataframe(df, max_points_per_trace, columns=df.columns[df.columns.str.startswith("f")])
+            figure = plot_sensors(df, line_descriptions=reference_data.get_sensor_types()[y_axis_column]["variable"])
+        else:
+            df = downsample_dataframe(df, max_points_per_trace, columns=[y_axis_column])
+            figure = plot_connection_statistic(df, y_axis_column)
+
+        return prepare_figure(figure)
+
+    def plot_sensor_data(data, sensor_name):
+        """Plot the given preprocessed sensor data. If there's data for more than one node, each node's data is plotted
+        as separate traces.
+
+        :param dict(str|None, pandas.DataFrame) data: the data for each node (see `get_sensor_data_by_node`)
+        :param str sensor_name:
+        :return plotly.graph_objs.Figure:
+        """
+        sensor_types = reference_data.get_sensor_types()
+
+        # Only the rows worth plotting are passed on so the figure is never built from all of them.
+        figures = {
+            node_id: SensorMeasurementSession(downsample_dataframe(df, max_points_per_trace), sensor_name).plot(
+                sensor_types
+            )
+            for node_id, df in data.items()
+        }
+
+        if len(figures) == 1:
+            figure = next(iter(figures.values()))
+        else:
+            figure = combine_node_figures(figures)
+
+        figure.update_layout(height=800)
+        return prepare_figure(figure)
+
+    def prepare_figure(figure):
+        """Make a figure of sensor data cheaper to send to and draw in the browser by removing unused hover data,
+        downsampling any traces still over the point budget, sending its datetimes as epoch milliseconds and, if it still has many points, drawing
+        it with WebGL.
+
+        :param plotly.graph_objs.Figure figure:
+        :return plotly.graph_objs.Figure:
+        """
+        figure = remove_redundant_hover_data(figure)
+        figure = downsample_figure(figure, max_points_per_trace)
+        figure = use_epoch_milliseconds(figure)
+        return use_webgl(figure, webgl_point_threshold)
+
+    def get_visible_time_window(relayout_data, plotted_query):
+        """Get the time window to show after the user has zoomed, panned or reset the axes of a graph. `None` is
+        returned if the relayout event didn't change the x-axis.
+
+        :param dict|None relayout_data:
+        :param dict|None plotted_query: the query used for the currently plotted data
+        :return (datetime.datetime, datetime.datetime, bool)|None: the start and finish of the window and whether the axes have been reset
+        """
+        if not plotted_query:
+            return None
+
+        if is_x_axis_reset(relayout_data):
+            return (
+                dt.datetime.fromisoformat(plotted_query["start"]),
+                dt.datetime.fromisoformat(plotted_query["finish"]),
+                True,
+            )
+
+        x_axis_range = get_x_axis_range(relayout_data)
+
+        if x_axis_range is None:
+            return None
+
+        return (*x_axis_range, False)
+
+    def can_reuse_plotted_data(plotted_query, start, finish):
+        """Check if the time window is covered by the raw (not aggregated) data behind the current plot.
+
+        :param dict plotted_query:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return bool:
+        """
+        return (
+            plotted_query["bucket_duration"] is None
+            and dt.datetime.fromisoformat(plotted_query["start"]) <= start
+            and finish <= dt.datetime.fromisoformat(plotted_query["finish"])
+        )
+
+    @app.callback(
+        Output("information-sensors-graph", "figure"),
+        Output("information-sensor-data-limit-warning", "children"),
+        Output("information-sensors-graph-query", "data"),
+        State("installation-select", "value"),
+        State("node-select", "value"),
+        State("y-axis-select", "value"),
+        State("time-range-select", "value"),
+        State("measurement-session-select", "value"),
+        Input("installation-select", "options"),
+        Input("refresh-button", "n_clicks"),
+    )
+    def plot_information_sensors_graph(
+        installation_reference,
+        node_id,
+        y_axis_column,
+        time_range,
+        measurement_session,
+        installations,
+        refresh,
+    ):
+        """Plot a graph of the information sensors for the given installation, y-axis column, and time range when the
+        refresh button is clicked or once the installation selector has been filled in. Clicking the refresh button
+        queries the data again rather than using any cached data.
+
+        :param str|None installation_reference:
+        :param str node_id:
+        :param str|None y_axis_column:
+        :param str time_range:
+        :param str measurement_session:
+        :param list installations:
+        :param int refresh:
+        :return (plotly.graph_objs.Figure, str, dict|None):
+        """
+        if not installation_reference or not y_axis_column:
+            raise PreventUpdate
+
+        if not node_id:
+            node_id = None
+
+        start, finish = generate_time_range(time_range, measurement_session)
+
+        if start is None:
+            return (px.scatter(), "No measurement session selected.", None)
+
+        sensor_name = "battery_info" if y_axis_column == "battery_info" else "connection_statistics"
+
+        if ctx.triggered_id == "refresh-button":
+            forget_sensor_data(
+                get_information_sensor_data, installation_reference, [node_id], sensor_name, start, finish
+            )
+
+        df, bucket_duration = get_information_sensor_data(installation_reference, node_id, sensor_name, start, finish)
+
+        if df.empty:
+            return (px.scatter(), "No data to plot.", None)
+
+        figure = plot_information_sensor_data(df, y_axis_column)
+
+        plotted_query = {
+            "installation_reference": installation_reference,
+            "node_id": node_id,
+            "sensor_name": sensor_name,
+            "y_axis_column": y_axis_column,
+            "start": start.isoformat(),
+            "finish": finish.isoformat(),
+            "bucket_duration": bucket_duration and bucket_duration.total_seconds(),
+        }
+
+        return (figure, _get_aggregation_warning(bucket_duration), plotted_query)
+
+    @app.callback(
+        Output("information-sensors-graph", "figure", allow_duplicate=True),
+        Output("information-sensor-data-limit-warning", "children", allow_duplicate=True),
+        State("information-sensors-graph-query", "data"),
+        Input("information-sensors-graph", "relayoutData"),
+        prevent_initial_call=True,
+    )
+    def zoom_information_sensors_graph(plotted_query, relayout_data):
+        """Replot the information sensors graph at full resolution for the visible time window when the user zooms or
+        pans. The data behind the current plot is reused if it covers the window; otherwise, only the window is queried.
+
+        :param dict|None plotted_query:
+        :param dict|None relayout_data:
+        :return (plotly.graph_objs.Figure, str):
+        """
+        visible_time_window = get_visible_time_window(relayout_data, plotted_query)
+
+        if visible_time_window is None:
+            raise PreventUpdate
+
+        start, finish, reset = visible_time_window
+
+        if can_reuse_plotted_data(plotted_query, start, finish):
+            df, bucket_duration = get_information_sensor_data(
+                plotted_query["installation_reference"],
+                plotted_query["node_id"],
+                plotted_query["sensor_name"],
+                dt.datetime.fromisoformat(plotted_query["start"]),
+                dt.datetime.fromisoformat(plotted_query["finish"]),
+            )
+
+            df = df[(df["datetime"] >= start) & (df["datetime"] <= finish)]
+
+        else:
+            df, bucket_duration = get_information_sensor_data(
+                plotted_query["installation_reference"],
+                plotted_query["node_id"],
+                plotted_query["sensor_name"],
+                start,
+                finish,
+            )
+
+        if df.empty:
+            raise PreventUpdate
+
+        figure = plot_information_sensor_data(df, plotted_query["y_axis_column"])
+
+        if not reset:
+            figure.update_xaxes(range=[start, finish])
+
+        return (figure, _get_aggregation_warning(bucket_duration))
+
+    @app.callback(
+        Output("sensors-graph", "figure"),
+        Output("sensor-data-limit-warning", "children"),
+        Output("sensors-graph-query", "data"),
+        Output("live-mode-checklist", "value"),
+        Output("sensors-graph-refinement", "data"),
+        State("installation-select", "value"),
+        State("node-select", "value"),
+        State("y-axis-select", "value"),
+        State("time-range-select", "value"),
+        State("measurement-session-select", "value"),
+        Input("installation-select", "options"),
+        Input("y-axis-select", "options"),
+        Input("refresh-button", "n_clicks"),
+    )
+    def plot_sensors_graph(
+        installation_reference,
+        node_id,
+        sensor_name,
+        time_range,
+        measurement_session,
+        installations,
+        sensor_names,
+        refresh,
+    ):
+        """Plot a graph of the sensor data for the given installation, y-axis column, and time range when the refresh
+        button is clicked or once the installation and sensor selectors have been filled in. Clicking the refresh button
+        queries the data again rather than using any cached data. Live mode is turned off so it doesn't append to the
+        new plot.
+
+        If progressive rendering is enabled and the full resolution data would be slow to get (see `is_slow_to_get`), a
+        coarse overview of the data is plotted straight away instead and the full resolution data is requested from
+        `refine_sensors_graph`, which replaces the overview once the data is ready.
+
+        :param str|None installation_reference:
+        :param str node_id:
+        :param str|None sensor_name:
+        :param str time_range:
+        :param str measurement_session:
+        :param list installations:
+        :param list sensor_names:
+        :param int refresh:
+        :return (plotly.graph_objs.Figure, str, dict|None, list, dict|None):
+        """
+        if not installation_reference or not sensor_name:
+            raise PreventUpdate
+
+        if not node_id:
+            node_id = None
+
+        start, finish = generate_time_range(time_range, measurement_session)
+
+        if start is None:
+            return (px.scatter(), "No measurement session selected.", None, [], None)
+
+        summaries = get_node_summaries(installation_reference, node_id, sensor_name, start, finish)
+        node_ids = list(summaries)
+
+        if not node_ids:
+            return (px.scatter(), "No data to plot.", None, [], None)
+
+        # The overview's buckets only need to span the data rather than the whole time window.
+        overview_start = min(first_datetime for _, first_datetime, _ in summaries.values())
+        overview_finish = max(last_datetime for _, _, last_datetime in summaries.values())
+
+        if ctx.triggered_id == "refresh-button":
+            forget_sensor_data(get_sensor_data, installation_reference, node_ids, sensor_name, start, finish)
+            get_sensor_data_overview.invalidate(
+                installation_reference, node_id, sensor_name, overview_start, overview_finish
+            )
+
+        if progressive_rendering and any(
+            is_slow_to_get(installation_reference, summary_node_id, sensor_name, start, finish, number_of_rows)
+            for summary_node_id, (number_of_rows, _, _) in summaries.items()
+        ):
+            data, bucket_duration = get_sensor_data_overview(
+                installation_reference,
+                node_id,
+                sensor_name,
+                overview_start,
+                overview_finish,
+            )
+
+            if not data:
+                return (px.scatter(), "No data to plot.", None, [], None)
+
+            plotted_query = _create_plotted_query(
+                installation_reference,
+                node_id,
+                node_ids,
+                sensor_name,
+                start,
+                finish,
+                bucket_duration,
+            )
+
+            return (
+                plot_sensor_data(data, sensor_name),
+                "Showing an overview of the data - loading it at full resolution...",
+                plotted_query,
+                [],
+                plotted_query,
+            )
+
+        data, bucket_duration = get_sensor_data_by_node(
+            installation_reference,
+            node_ids,
+            sensor_name,
+            start,
+            finish,
+        )
+
+        if not data:
+            return (px.scatter(), "No data to plot.", None, [], None)
+
+        figure = plot_sensor_data(data, sensor_name)
+        plotted_query = _create_plotted_query(
+            installation_reference, node_id, node_ids, sensor_name, start, finish, bucket_duration
+        )
+
+        # The refinement request is cleared so any refinement still in progress for an earlier plot is discarded.
+        return (figure, _get_aggregation_warning(bucket_duration), plotted_query, [], None)
+
+    @app.callback(
+        Output("sensors-graph-refined", "data"),
+        Input("sensors-graph-refinement", "data"),
+        prevent_initial_call=True,
+    )
+    def refine_sensors_graph(refinement):
+        """Plot the full resolution sensor data requested by `plot_sensors_graph` after it plotted an overview of it. The
+        figure is put in a store rather than straight into the graph so the graph's loading spinner doesn't hide the
+        overview in the meantime; it's moved into the graph in the browser.
+
+        :param dict|None refinement: the query behind the overview
+        :return dict: the figure, the data limit warning and the query behind the plotted data
+        """
+        if refinement is None:
+            raise PreventUpdate
+
+        start = dt.datetime.fromisoformat(refinement["start"])
+        finish = dt.datetime.fromisoformat(refinement["finish"])
+
+        data, bucket_duration = get_sensor_data_by_node(
+            refinement["installation_reference"],
+            refinement["node_ids"],
+            refinement["sensor_name"],
+            start,
+            finish,
+        )
+
+        if not data:
+            raise PreventUpdate
+
+        return {
+            "figure": plot_sensor_data(data, refinement["sensor_name"]),
+            "warning": _get_aggregation_warning(bucket_duration),
+            "query": _create_plotted_query(
+                refinement["installation_reference"],
+                refinement["node_id"],
+                refinement["node_ids"],
+                refinement["sensor_name"],
+                start,
+                finish,
+                bucket_duration,
+            ),
+        }
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="sensors", function_name="showRefinedFigure"),
+        Output("sensors-graph", "figure", allow_duplicate=True),
+        Output("sensor-data-limit-warning", "children", allow_duplicate=True),
+        Output("sensors-graph-query", "data", allow_duplicate=True),
+        Input("sensors-graph-refined", "data"),
+        State("sensors-graph-refinement", "data"),
+        prevent_initial_call=True,
+    )
 
     @app.callback(
-        Output("information-sensors-graph", "figure"),
-        Output("information-sensor-data-limit-warning", "children"),
-        State("installation-select", "value"),
-        State("node-select", "value"),
-        State("y-axis-select", "value"),
-        State("time-range-select", "value"),
-        State("measurement-session-select", "value"),
-        Input("refresh-button", "n_clicks"),
+        Output("sensors-graph", "figure", allow_duplicate=True),
+        Output("sensor-data-limit-warning", "children", allow_duplicate=True),
+        State("sensors-graph-query", "data"),
+        Input("sensors-graph", "relayoutData"),
+        prevent_initial_call=True,
     )
-    @cache.memoize(timeout=cache_timeout, args_to_ignore=["refresh"])
-    def plot_information_sensors_graph(
-        installation_reference,
-        node_id,
-        y_axis_column,
-        time_range,
-        measurement_session,
-        refresh,
-    ):
-        """Plot a graph of the information sensors for the given installation, y-axis column, and time range when these
-        values are changed or the refresh button is clicked.
+    def zoom_sensors_graph(plotted_query, relayout_data):
+        """Replot the sensors graph at full resolution for the visible time window when the user zooms or pans. The
+        data behind the current plot is reused if it covers the window; otherwise, only the window is queried.
 
-        :param str installation_reference:
-        :param str node_id:
-        :param str y_axis_column:
-        :param str time_range:
-        :param str measurement_session:
-        :param int refresh:
+        :param dict|None plotted_query:
+        :param dict|None relayout_data:
         :return (plotly.graph_objs.Figure, str):
         """
-        if not node_id:
-            node_id = None
+        visible_time_window = get_visible_time_window(relayout_data, plotted_query)
 
-        start, finish = generate_time_range(time_range, measurement_session)
+        if visible_time_window is None:
+            raise PreventUpdate
 
-        if start is None:
-            return (px.scatter(), "No measurement session selected.")
+        start, finish, reset = visible_time_window
 
-        if y_axis_column == "battery_info":
-            df, data_limit_applied = BigQuery().get_sensor_data(
-                installation_reference,
-                node_id,
-                y_axis_column,
-                start=start,
-                finish=finish,
+        if can_reuse_plotted_data(plotted_query, start, finish):
+            data, bucket_duration = get_sensor_data_by_node(
+                plotted_query["installation_reference"],
+                plotted_query["node_ids"],
+                plotted_query["sensor_name"],
+                dt.datetime.fromisoformat(plotted_query["start"]),
+                dt.datetime.fromisoformat(plotted_query["finish"]),
             )
 
-            if df.empty:
-                return (px.scatter(), "No data to plot.")
-
-            figure = plot_sensors(df, line_descriptions=sensor_types[y_axis_column]["variable"])
+            data = {node_id: df.loc[start:finish] for node_id, df in data.items()}
+            data = {node_id: df for node_id, df in data.items() if not df.empty}
 
         else:
-            df = BigQuery().get_aggregated_connection_statistics(
-                installation_reference=installation_reference,
-                node_id=node_id,
-                start=start,
-                finish=finish,
+            # Only the nodes with data in the plotted time window can have data in the visible one.
+            data, bucket_duration = get_sensor_data_by_node(
+                plotted_query["installation_reference"],
+                plotted_query["node_ids"],
+                plotted_query["sensor_name"],
+                start,
+                finish,
             )
 
-            if df.empty:
-                return (px.scatter(), "No data to plot.")
+        if not data:
+            raise PreventUpdate
+
+        figure = plot_sensor_data(data, plotted_query["sensor_name"])
 
-            data_limit_applied = ""
-            figure = plot_connection_statistic(df, y_axis_column)
+        if not reset:
+            figure.update_xaxes(range=[start, finish])
+
+        return (figure, _get_aggregation_warning(bucket_duration))
+
+    def fetch_live_sensor_data(key, last_datetime):
+        """Fetch the sensor data newer than the given datetime for a live data stream.
 
-        if data_limit_applied:
-            return (figure, f"Large amount of data - the query has been limited to the latest {ROW_LIMIT} datapoints.")
+        :param (str, str|None, str) key: the installation reference, node ID and sensor name of the stream
+        :param datetime.datetime last_datetime: the datetime of the last row already fetched
+        :return dict|None: the datetimes of the new rows, their values for each sensor, and the datetime of the last one, or `None` if there are no new rows
+        """
+        installation_reference, node_id, sensor_name = key
+
+        df, _ = _get_bigquery(bigquery_factory).get_sensor_data(
+            installation_reference=installation_reference,
+            node_id=node_id,
+            sensor_type_reference=sensor_name,
+            start=last_datetime + dt.timedelta(microseconds=1),
+            finish=dt.datetime.utcnow(),
+        )
+
+        df = df[df["datetime"] > last_datetime] if not df.empty else df
+
+        if df.empty:
+            return None
+
+        new_data = preprocess_sensor_data(df, sensor_name, pad_gaps=False)
+
+        return {
+            "x": [_format_datetime(datetime) for datetime in new_data.index],
+            "y": {
+                column: new_data[column].astype(object).where(new_data[column].notna(), None).tolist()
+                for column in new_data.columns
+            },
+            "last_datetime": _format_datetime(df["datetime"].max()),
+        }
+
+    live_data_hub = LiveDataHub(
+        fetch_live_sensor_data,
+        interval=LIVE_UPDATE_INTERVAL,
+        max_subscribers=max_live_subscribers,
+    )
+
+    # New data for the live sensors graph is pushed to the browser over server-sent events by this route (see
+    # `assets/live.js`) rather than each browser tab polling for it.
+    @app.server.route("/live-data")
+    def stream_live_data():
+        """Stream the new sensor data for an installation, node and sensor as server-sent events. Each stream holds one
+        of the server's threads, so once there are `max_live_subscribers` of them, new ones are turned away with a 503
+        response and the browser polls `/live-data/recent` instead.
+
+        :return flask.Response:
+        """
+        arguments = flask.request.args
+        key = (arguments["installation_reference"], arguments.get("node_id") or None, arguments["sensor_name"])
+        return create_live_data_response(live_data_hub, key, since=dt.datetime.fromisoformat(arguments["since"]))
 
-        return (figure, [])
+    @app.server.route("/live-data/recent")
+    def get_recent_live_data():
+        """Get the recent sensor data for an installation, node and sensor newer than the given datetime, for browsers
+        polling for it rather than streaming it.
+
+        :return flask.Response:
+        """
+        arguments = flask.request.args
+        key = (arguments["installation_reference"], arguments.get("node_id") or None, arguments["sensor_name"])
+        return create_recent_live_data_response(live_data_hub, key, since=dt.datetime.fromisoformat(arguments["since"]))
 
     @app.callback(
-        Output("sensors-graph", "figure"),
-        Output("sensor-data-limit-warning", "children"),
+        Output("sensors-graph", "figure", allow_duplicate=True),
+        Output("sensor-data-limit-warning", "children", allow_duplicate=True),
+        Output("sensors-graph-live", "data"),
         State("installation-select", "value"),
         State("node-select", "value"),
         State("y-axis-select", "value"),
-        State("time-range-select", "value"),
-        State("measurement-session-select", "value"),
-        Input("refresh-button", "n_clicks"),
+        Input("live-mode-checklist", "value"),
+        prevent_initial_call=True,
     )
-    @cache.memoize(timeout=cache_timeout, args_to_ignore=["refresh"])
-    def plot_sensors_graph(
-        installation_reference,
-        node_id,
-        sensor_name,
-        time_range,
-        measurement_session,
-        refresh,
-    ):
-        """Plot a graph of the sensor data for the given installation, y-axis column, and time range when these values are
-        changed or the refresh button is clicked.
+    def start_live_sensors_graph(installation_reference, node_id, sensor_name, live_mode):
+        """Plot the last minute of sensor data when live mode is turned on, after which new data is pushed to the graph
+        by the server as it arrives (see `assets/live.js`). The graph stops updating when live mode is turned off.
 
         :param str installation_reference:
         :param str node_id:
         :param str sensor_name:
-        :param str time_range:
-        :param str measurement_session:
-        :param int refresh:
-        :return (plotly.graph_objs.Figure, str):
+        :param list(str) live_mode: `["live"]` if live mode is on
+        :return (plotly.graph_objs.Figure, str, dict|None):
         """
-        if not node_id:
-            node_id = None
-
-        start, finish = generate_time_range(time_range, measurement_session)
+        if not live_mode:
+            return (no_update, no_update, None)
 
-        if start is None:
-            return (px.scatter(), "No measurement session selected.")
+        node_id = node_id or None
+        finish = dt.datetime.utcnow()
 
-        df, data_limit_applied = BigQuery().get_sensor_data(
-            installation_reference,
-            node_id,
-            sensor_name,
-            start=start,
+        df, _ = _get_bigquery(bigquery_factory).get_sensor_data(
+            installation_reference=installation_reference,
+            node_id=node_id,
+            sensor_type_reference=sensor_name,
+            start=finish - LIVE_WINDOW_DURATION,
             finish=finish,
         )
 
         if df.empty:
-            return (px.scatter(), "No data to plot.")
+            last_datetime = finish
+            figure = px.scatter()
+        else:
+            last_datetime = df["datetime"].max()
+            figure = SensorMeasurementSession(preprocess_sensor_data(df, sensor_name), sensor_name).plot(
+                reference_data.get_sensor_types()
+            )
+            figure.update_layout(height=800)
+
+        live_state = {
+            "installation_reference": installation_reference,
+            "node_id": node_id,
+            "sensor_name": sensor_name,
+            "last_datetime": _format_datetime(last_datetime),
+            "trace_indices": {trace.name: index for index, trace in enumerate(figure.data)},
+            # Each trace is limited to about as many points as the window started with so it scrolls instead of growing.
+            "max_points": max([len(trace.x) for trace in figure.data if trace.x is not None] + [LIVE_MINIMUM_POINTS]),
+            "update_interval": LIVE_UPDATE_INTERVAL,
+        }
+
+        return (figure, "Live - new data is added as it arrives.", live_state)
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="live", function_name="subscribe"),
+        Output("sensors-graph-live-status", "children"),
+        Input("sensors-graph-live", "data"),
+        State("sensors-graph", "id"),
+    )
 
-        # Extract only data columns and set index to 'datetime', so that DataFrame is accepted by RawSignal class
-        data_columns = df.columns[df.columns.str.startswith("f")].tolist()
-        sensor_data = df[["datetime"] + data_columns].set_index("datetime")
-        sensor_data.columns = sensor_types[sensor_name]["sensors"]
-        # Use pre-process library
-        raw_data = RawSignal(sensor_data, sensor_name)
-        raw_data.pad_gaps()
-        raw_data.measurement_to_variable()
-        sensor_session = SensorMeasurementSession(raw_data.dataframe, sensor_name)
+    def get_pressures(df):
+        """Convert raw barometer data to pressures indexed by datetime, with a column per sensor.
 
-        figure = sensor_session.plot(sensor_types)
-        figure.update_layout(height=800)
+        :param pandas.DataFrame df: the raw barometer data
+        :return pandas.DataFrame:
+        """
+        sensor_names = reference_data.get_sensor_types()["barometer"]["sensors"]
 
-        if data_limit_applied:
-            return (figure, f"Large amount of data - the query has been limited to the latest {ROW_LIMIT} datapoints.")
+        if df.empty:
+            return pd.DataFrame(columns=sensor_names, dtype=float)
 
-        return (figure, [])
+        data_columns = df.columns[df.columns.str.startswith("f")].tolist()
+        pressures = df[["datetime"] + data_columns].set_index("datetime")
+        pressures.columns = sensor_names
+        raw_data = RawSignal(pressures, "barometer")
+        raw_data.measurement_to_variable()
+        return raw_data.dataframe
 
-    @cache.memoize(timeout=0)
-    def get_pressure_data_for_time_window(installation_reference, node_id, start_datetime, finish_datetime):
-        """Get pressure data for the given node during the given time window along with the minimum and maximum
-        pressures over all the sensors over that window.
+    def get_window_cp(
+        installation_reference,
+        node_id,
+        sensor_coordinates_reference,
+        air_density,
+        u,
+        p_inf,
+        start,
+        number_of_seconds,
+    ):
+        """Compute the Cp of every barometer at every time in a time window in one operation.
 
         :param str installation_reference:
-        :param str node_id:
-        :param datetime.datetime start_datetime:
-        :param datetime.datetime finish_datetime:
-        :return (pandas.DataFrame, float, float): the pressure profiles, minimum pressure, and maximum pressure for the time window
+        :param str|None node_id:
+        :param str sensor_coordinates_reference:
+        :param float air_density:
+        :param float u:
+        :param float p_inf:
+        :param datetime.datetime start: the start of the time window
+        :param int number_of_seconds: the number of seconds in the time window
+        :return (numpy.ndarray, pandas.DataFrame): the chordwise positions of the barometers and their Cp (columns) at each time (rows)
         """
-        df, _ = BigQuery().get_sensor_data(
+        df = get_pressure_data_for_time_window(
             installation_reference=installation_reference,
             node_id=node_id,
-            sensor_type_reference="barometer",
-            start=start_datetime,
-            finish=finish_datetime,
+            start_datetime=start,
+            finish_datetime=start + dt.timedelta(seconds=number_of_seconds),
         )
 
-        logger.info(
-            "Downloaded pressure data %d second time window for start datetime %r and finish datetime %r.",
-            (finish_datetime - start_datetime).seconds,
-            start_datetime.isoformat(),
-            finish_datetime.isoformat(),
-        )
+        x_positions, _ = reference_data.get_sensor_positions(sensor_coordinates_reference)
+        pressures = get_pressures(df)
+        number_of_sensors = min(len(x_positions), len(pressures.columns))
+
+        if len(x_positions) != len(pressures.columns):
+            logger.warning(
+                "There are %d sensor coordinates for %r but %d barometers - plotting the first %d.",
+                len(x_positions),
+                sensor_coordinates_reference,
+                len(pressures.columns),
+                number_of_sensors,
+            )
 
-        return df
+        cp = compute_cp(pressures.iloc[:, :number_of_sensors], air_density=air_density, u=u, p_inf=p_inf)
+        logger.debug("Computed the Cp of %d sensors at %d times.", number_of_sensors, len(cp))
+        return x_positions[:number_of_sensors], cp
+
+    def get_cp_frames(x_positions, cp, cp_minimum, cp_maximum, start, number_of_seconds):
+        """Get the Cp profile for every second of a time window, ready to be plotted in the browser (see
+        `assets/cp.js`).
+
+        :param numpy.ndarray x_positions: the chordwise positions of the barometers
+        :param pandas.DataFrame cp: the Cp of each barometer (columns) at each time (rows) in the time window
+        :param float cp_minimum:
+        :param float cp_maximum:
+        :param datetime.datetime start: the start of the time window
+        :param int number_of_seconds: the number of seconds in the time window
+        :return dict: the empty Cp figure and the Cp of each sensor for each second of the time window (including its last second)
+        """
+        cp_profiles = get_mean_per_second(cp, start=start, number_of_seconds=number_of_seconds)
+
+        return {
+            "figure": create_cp_figure(x_positions, cp_minimum=cp_minimum, cp_maximum=cp_maximum),
+            "cp": cp_profiles.round(4).to_numpy(),
+        }
+
+    def prefetch_pressure_data(installation_reference, node_id, start, number_of_seconds):
+        """Load the pressure data for a time window into the pressure cache, logging rather than raising any error. This
+        is meant to be run in the background.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param datetime.datetime start:
+        :param int number_of_seconds:
+        :return None:
+        """
+        try:
+            get_pressure_data_for_time_window(
+                installation_reference=installation_reference,
+                node_id=node_id,
+                start_datetime=start,
+                finish_datetime=start + dt.timedelta(seconds=number_of_seconds),
+            )
+        except Exception:
+            logger.exception("Failed to prefetch the pressure data starting at %r.", start.isoformat())
 
     @app.callback(
-        Output("pressure-profile-graph", "figure"),
+        Output("cp-profiles", "data"),
+        Output("cp-summary-graph", "figure"),
         State("installation-select", "value"),
         State("node-select", "value"),
         State("sensor-coordinates-select", "value"),
@@ -213,11 +1351,12 @@ def register_callbacks(app, cache, cache_timeout, tabs, sensor_types):
         State("hour", "value"),
         State("minute", "value"),
         State("second", "value"),
-        Input("time-slider", "value"),
+        Input("cp-summary-select", "value"),
+        Input("installation-select", "options"),
+        Input("sensor-coordinates-select", "options"),
         Input("refresh-button", "n_clicks"),
     )
-    @cache.memoize(timeout=cache_timeout, args_to_ignore=["refresh"])
-    def plot_cp_graph(
+    def get_cp_profiles(
         installation_reference,
         node_id,
         sensor_coordinates_reference,
@@ -230,73 +1369,272 @@ def register_callbacks(app, cache, cache_timeout, tabs, sensor_types):
         hour,
         minute,
         second,
-        time_delta,
+        summary_type,
+        installations,
+        sensor_coordinates_references,
         refresh,
     ):
-        if not node_id:
-            node_id = None
+        """Compute the Cp of every sensor at every time in the time window once, then send the Cp profile for every
+        second of the window to the browser (where the time slider picks which one to plot without another request to
+        the server) and summarise the whole window as an envelope or heatmap. This is also done once the installation
+        and sensor coordinates selectors have been filled in.
+
+        :return (dict, plotly.graph_objs.Figure): the empty Cp figure and the Cp of each sensor for each second of the time window, and the summary figure
+        """
+        if not installation_reference or not sensor_coordinates_reference:
+            raise PreventUpdate
 
-        initial_datetime = dt.datetime.combine(date=dt.date.fromisoformat(date), time=dt.time(hour, minute, second))
+        start = _combine_date_and_time(date, hour, minute, second)
 
-        df = get_pressure_data_for_time_window(
+        x_positions, cp = get_window_cp(
             installation_reference=installation_reference,
-            node_id=node_id,
-            start_datetime=initial_datetime,
-            finish_datetime=initial_datetime + dt.timedelta(seconds=60),
+            node_id=node_id or None,
+            sensor_coordinates_reference=sensor_coordinates_reference,
+            air_density=air_density,
+            u=u,
+            p_inf=p_inf,
+            start=start,
+            number_of_seconds=CP_TIME_WINDOW_SECONDS,
         )
 
-        slider_datetime = initial_datetime + dt.timedelta(seconds=time_delta)
+        if summary_type == "heatmap":
+            summary_figure = create_cp_heatmap_figure(cp, cp_minimum=cp_minimum, cp_maximum=cp_maximum)
+        else:
+            summary_figure = create_cp_envelope_figure(x_positions, cp, cp_minimum=cp_minimum, cp_maximum=cp_maximum)
 
-        df = df[
-            (df["datetime"] >= slider_datetime - dt.timedelta(seconds=0.5))
-            & (df["datetime"] < slider_datetime + dt.timedelta(seconds=0.5))
-        ]
+        cp_frames = get_cp_frames(
+            x_positions,
+            cp,
+            cp_minimum=cp_minimum,
+            cp_maximum=cp_maximum,
+            start=start,
+            number_of_seconds=CP_TIME_WINDOW_SECONDS,
+        )
+
+        return cp_frames, summary_figure
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="cp", function_name="plotProfile"),
+        Output("pressure-profile-graph", "figure"),
+        Input("cp-profiles", "data"),
+        Input("time-slider", "value"),
+    )
+
+    @app.callback(
+        Output("playback-frames", "data"),
+        Input("playback-request", "data"),
+        State("installation-select", "value"),
+        State("node-select", "value"),
+        State("sensor-coordinates-select", "value"),
+        State("air-density-input", "value"),
+        State("u-input", "value"),
+        State("p-inf-input", "value"),
+        State("cp-minimum-input", "value"),
+        State("cp-maximum-input", "value"),
+        State("date-select", "date"),
+        State("hour", "value"),
+        State("minute", "value"),
+        State("second", "value"),
+        State("playback-duration-input", "value"),
+        prevent_initial_call=True,
+    )
+    def get_playback_frames(
+        request,
+        installation_reference,
+        node_id,
+        sensor_coordinates_reference,
+        air_density,
+        u,
+        p_inf,
+        cp_minimum,
+        cp_maximum,
+        date,
+        hour,
+        minute,
+        second,
+        duration,
+    ):
+        """Compute the next chunk of Cp playback frames requested by the browser (see `assets/cp.js`). Each request is
+        independent of the others, so only one chunk of the playback period is ever held in memory per request. The
+        pressure data for the chunk after it is loaded into the pressure cache in the background so it's ready by the
+        time it's requested.
+
+        :param dict request: the position (in seconds since the start of playback) of the first frame to compute
+        :param int duration: the length of the playback period in minutes
+        :return dict: the position of the first frame, the empty Cp figure, and the Cp of each sensor for each second of the chunk
+        """
+        if not request or request.get("position") is None or not duration:
+            raise PreventUpdate
+
+        if not installation_reference or not sensor_coordinates_reference:
+            raise PreventUpdate
 
-        logger.debug("Filtered pressure data time window for single datetime.")
+        # As in the other Cp callbacks, no node selected means the data of all the installation's nodes.
+        node_id = node_id or None
+        position = request["position"]
+        chunk_start = _combine_date_and_time(date, hour, minute, second) + dt.timedelta(seconds=position)
+        number_of_frames = min(CP_TIME_WINDOW_SECONDS, duration * 60 - position + 1)
+
+        if position + number_of_frames <= duration * 60:
+            CP_PREFETCH_EXECUTOR.submit(
+                prefetch_pressure_data,
+                installation_reference,
+                node_id,
+                chunk_start + dt.timedelta(seconds=number_of_frames),
+                CP_TIME_WINDOW_SECONDS,
+            )
 
-        return plot_cp_curve(
-            df=df,
+        x_positions, cp = get_window_cp(
+            installation_reference=installation_reference,
+            node_id=node_id,
             sensor_coordinates_reference=sensor_coordinates_reference,
             air_density=air_density,
             u=u,
             p_inf=p_inf,
+            start=chunk_start,
+            number_of_seconds=CP_TIME_WINDOW_SECONDS,
+        )
+
+        frames = get_cp_frames(
+            x_positions,
+            cp,
             cp_minimum=cp_minimum,
             cp_maximum=cp_maximum,
+            start=chunk_start,
+            number_of_seconds=CP_TIME_WINDOW_SECONDS,
         )
 
+        return {"position": position, "figure": frames["figure"], "cp": frames["cp"][:number_of_frames]}
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="cp", function_name="togglePlayback"),
+        Output("playback-interval", "disabled", allow_duplicate=True),
+        Output("playback-interval", "interval"),
+        Output("playback-button", "children", allow_duplicate=True),
+        Output("playback-position", "data", allow_duplicate=True),
+        Output("playback-request", "data", allow_duplicate=True),
+        Output("playback-buffer", "data", allow_duplicate=True),
+        Input("playback-button", "n_clicks"),
+        State("playback-interval", "disabled"),
+        State("playback-frame-rate-input", "value"),
+        State("playback-position", "data"),
+        State("playback-duration-input", "value"),
+        prevent_initial_call=True,
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="cp", function_name="bufferPlaybackFrames"),
+        Output("playback-buffer", "data", allow_duplicate=True),
+        Input("playback-frames", "data"),
+        State("playback-request", "data"),
+        State("playback-position", "data"),
+        State("playback-buffer", "data"),
+        prevent_initial_call=True,
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="cp", function_name="advancePlayback"),
+        Output("playback-position", "data", allow_duplicate=True),
+        Output("playback-request", "data", allow_duplicate=True),
+        Output("playback-interval", "disabled", allow_duplicate=True),
+        Output("playback-button", "children", allow_duplicate=True),
+        Input("playback-interval", "n_intervals"),
+        State("playback-position", "data"),
+        State("playback-buffer", "data"),
+        State("playback-request", "data"),
+        State("playback-duration-input", "value"),
+        prevent_initial_call=True,
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="cp", function_name="plotPlaybackFrame"),
+        Output("pressure-profile-graph", "figure", allow_duplicate=True),
+        Output("playback-time", "children"),
+        Input("playback-position", "data"),
+        Input("playback-buffer", "data"),
+        State("playback-duration-input", "value"),
+        prevent_initial_call=True,
+    )
+
     @app.callback(
         Output("installation-select", "options"),
+        Output("installation-select", "value"),
+        State("installation-select", "value"),
         Input("installation-check-button", "n_clicks"),
     )
-    def update_installation_selector(refresh):
-        """Update the installation selector with any new installations when the refresh button is clicked.
+    def update_installation_selector(current_installation_reference, refresh):
+        """Fill in the installation selector when it's rendered and update it with any new installations when the
+        refresh button is clicked.
 
+        :param str|None current_installation_reference:
         :param int refresh:
-        :return list:
+        :return (list, str|None):
         """
-        return BigQuery().get_installations()
+        installations = reference_data.get_installations(refresh=bool(refresh))
+        installation_references = {installation["value"] for installation in installations}
+
+        if current_installation_reference in installation_references or not installations:
+            return installations, current_installation_reference
+
+        return installations, installations[0]["value"]
 
     @app.callback(
         Output("sensor-coordinates-select", "options"),
+        Output("sensor-coordinates-select", "value"),
+        State("sensor-coordinates-select", "value"),
         Input("sensor-coordinates-check-button", "n_clicks"),
     )
-    def update_sensor_coordinates_selector(refresh):
-        """Update the sensor coordinates selector with any new ones when the refresh button is clicked.
+    def update_sensor_coordinates_selector(current_sensor_coordinates_reference, refresh):
+        """Fill in the sensor coordinates selector when it's rendered and update it with any new sensor coordinates
+        when the refresh button is clicked.
 
+        :param str|None current_sensor_coordinates_reference:
         :param int refresh:
-        :return list:
+        :return (list, str|None):
+        """
+        references = reference_data.get_sensor_coordinates(refresh=bool(refresh))["reference"].tolist()
+
+        if current_sensor_coordinates_reference in references or not references:
+            return references, current_sensor_coordinates_reference
+
+        return references, references[0]
+
+    @app.callback(
+        Output("y-axis-select", "options"),
+        Output("y-axis-select", "value"),
+        State("y-axis-select", "value"),
+        Input("nav-tabs", "value"),
+    )
+    def update_sensor_selector(current_sensor_name, section_name):
+        """Fill in the sensor selector of the sensors tab when it's rendered.
+
+        :param str|None current_sensor_name:
+        :param str section_name:
+        :return (list, str|None):
         """
-        return BigQuery().get_sensor_coordinates()["reference"]
+        if section_name != "sensors":
+            raise PreventUpdate
+
+        sensor_names = [sensor for sensor in reference_data.get_sensor_types() if sensor not in EXCLUDED_SENSORS]
+
+        if current_sensor_name in sensor_names or not sensor_names:
+            return sensor_names, current_sensor_name
+
+        return sensor_names, sensor_names[0]
 
     @app.callback(
         Output("graph-title", "children"),
         State("y-axis-select", "value"),
+        Input("y-axis-select", "options"),
         Input("refresh-button", "n_clicks"),
     )
-    def update_graph_title(selected_y_axis, refresh):
-        """Update the graph title with the name of the currently selected y-axis.
+    def update_graph_title(selected_y_axis, sensor_names, refresh):
+        """Update the graph title with the name of the currently selected y-axis when the refresh button is clicked or
+        once the y-axis selector has been filled in.
 
         :param str selected_y_axis:
+        :param list sensor_names:
+        :param int refresh:
         :return str:
         """
         if not selected_y_axis:
@@ -396,7 +1734,7 @@ def register_callbacks(app, cache, cache_timeout, tabs, sensor_types):
         if y_axis in {"filtered_rssi", "filtered_rssi", "tx_power", "allocated_heap_memory"}:
             y_axis = "connection_statistics"
 
-        measurement_sessions = BigQuery().get_measurement_sessions(
+        measurement_sessions = _get_bigquery(bigquery_factory).get_measurement_sessions(
             installation_reference=installation_reference,
             node_id=node_id,
             sensor_type_reference=y_axis,
@@ -441,6 +1779,54 @@ def register_callbacks(app, cache, cache_timeout, tabs, sensor_types):
         return tabs[section_name]
 
 
+def _get_bigquery(bigquery_factory):
+    """Get the shared BigQuery client, with its queries shared with any identical queries already running in other
+    threads.
+
+    :param dashboard.queries.BigQueryClientFactory bigquery_factory:
+    :return dashboard.coalescing._SingleFlightProxy: the proxied `dashboard.queries.BigQuery` instance
+    """
+    return SINGLE_FLIGHT.wrap(bigquery_factory.get())
+
+
+def _create_plotted_query(installation_reference, node_id, node_ids, sensor_name, start, finish, bucket_duration):
+    """Create the description of the query behind a sensors graph's plotted data that's stored alongside the graph.
+
+    :param str installation_reference:
+    :param str|None node_id: the selected node
+    :param list(str|None) node_ids: the nodes whose data is plotted
+    :param str sensor_name:
+    :param datetime.datetime start:
+    :param datetime.datetime finish:
+    :param datetime.timedelta|None bucket_duration: the duration of the aggregation buckets (`None` if the data isn't aggregated)
+    :return dict:
+    """
+    return {
+        "installation_reference": installation_reference,
+        "node_id": node_id,
+        "node_ids": node_ids,
+        "sensor_name": sensor_name,
+        "start": start.isoformat(),
+        "finish": finish.isoformat(),
+        "bucket_duration": bucket_duration and bucket_duration.total_seconds(),
+    }
+
+
+def _get_aggregation_warning(bucket_duration):
+    """Get the warning to show when the plotted data has been aggregated into time buckets.
+
+    :param datetime.timedelta|None bucket_duration:
+    :return str|list: the warning, or an empty list if the data isn't aggregated
+    """
+    if bucket_duration is None:
+        return []
+
+    return (
+        f"Large amount of data - more than {ROW_LIMIT} datapoints, so the minimum and maximum over each {bucket_duration} "
+        "interval are shown. Zoom in to see the raw data."
+    )
+
+
 def _combine_dates_and_times(
     start_date,
     start_hour,
@@ -481,3 +1867,24 @@ def _combine_dates_and_times(
         return (start, end)
 
     return (None, None)
+
+
+def _combine_date_and_time(date, hour, minute, second):
+    """Combine the Cp tab's start date and time inputs into a datetime.
+
+    :param str date:
+    :param int hour:
+    :param int minute:
+    :param int second:
+    :return datetime.datetime:
+    """
+    return dt.datetime.combine(date=dt.date.fromisoformat(date), time=dt.time(hour, minute, second))
+
+
+def _format_datetime(datetime):
+    """Format a datetime for live data messages. Every datetime has microseconds so they can be compared as strings.
+
+    :param datetime.datetime|pandas.Timestamp datetime:
+    :return str:
+    """
+    return pd.Timestamp(datetime).strftime("%Y-%m-%dT%H:%M:%S.%f")
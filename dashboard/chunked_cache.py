@@ -0,0 +1,212 @@
+import datetime as dt
+import logging
+import time
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+EPOCH = dt.datetime(1970, 1, 1)
+
+# The chunk duration to use for time windows up to each length. Longer windows aren't split into chunks.
+CHUNK_DURATIONS = (
+    (dt.timedelta(hours=1), dt.timedelta(minutes=1)),
+    (dt.timedelta(weeks=1), dt.timedelta(hours=1)),
+    (dt.timedelta(days=31), dt.timedelta(days=1)),
+)
+
+
+class ChunkedDataCache:
+    """A cache of time-series data split into chunks aligned to fixed time boundaries, so that overlapping time windows
+    (e.g. "Last hour" requested a few seconds apart) share the same cached chunks. Chunks ending more than
+    `settling_time` ago are assumed not to change and are cached for `lifetime`, so data uploaded late (e.g. after a
+    gateway loses its connection) eventually shows up; more recent chunks are never cached, so only they (and any
+    chunks not cached yet) need querying. Chunks can also be removed explicitly to pick up late data straight away.
+
+    :param dashboard.data_cache.ArrowDataCache|dashboard.data_cache.SharedArrowDataCache data_cache: the cache to store the chunks in
+    :param datetime.timedelta settling_time: how long after a chunk ends its data is assumed to be complete
+    :param datetime.timedelta|None lifetime: how long to cache each chunk for (`None` means until it's evicted)
+    :return None:
+    """
+
+    def __init__(self, data_cache, settling_time=dt.timedelta(minutes=10), lifetime=dt.timedelta(days=1)):
+        self.data_cache = data_cache
+        self.settling_time = settling_time
+        self.lifetime = lifetime
+
+    def get(self, key, start, finish, chunk_duration):
+        """Get the cached chunks overlapping the time window along with the time ranges of the chunks missing from the
+        cache. Expired chunks are removed and count as missing. Contiguous missing chunks are merged into a single time
+        range so they can be queried together.
+
+        :param dict key: the fields identifying the time series (e.g. its installation, node and sensor type)
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param datetime.timedelta chunk_duration: the duration of the chunks (see `get_chunk_duration`)
+        :return (list(pandas.DataFrame), list((datetime.datetime, datetime.datetime))): the cached chunks and the missing time ranges (each including its start but not its finish)
+        """
+        chunks = get_chunks(start, finish, chunk_duration)
+        chunk_keys = [self._get_chunk_key(key, chunk_start, chunk_duration) for chunk_start, _ in chunks]
+
+        found = []
+        missing = []
+
+        now = time.time()
+
+        for (chunk_start, chunk_finish), chunk_key, (cached_chunk, metadata) in zip(
+            chunks, chunk_keys, self.data_cache.get_many_with_metadata(*chunk_keys)
+        ):
+            if cached_chunk is not None and metadata.get("expires") is not None and metadata["expires"] < now:
+                self.data_cache.delete(chunk_key)
+                cached_chunk = None
+
+            if cached_chunk is not None:
+                found.append(cached_chunk)
+            elif missing and missing[-1][1] == chunk_start:
+                missing[-1] = (missing[-1][0], chunk_finish)
+            else:
+                missing.append((chunk_start, chunk_finish))
+
+        logger.debug("Found %d of %d %s chunks for %r in the cache.", len(found), len(chunks), chunk_duration, key)
+        return found, missing
+
+    def get_missing_time_ranges(self, key, start, finish, chunk_duration):
+        """Get the time ranges of the chunks overlapping the time window that are missing from the cache without reading
+        the cached ones. Expired chunks that haven't been removed yet count as cached. Contiguous missing chunks are
+        merged into a single time range.
+
+        :param dict key: the fields identifying the time series
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param datetime.timedelta chunk_duration: the duration of the chunks (see `get_chunk_duration`)
+        :return list((datetime.datetime, datetime.datetime)): the missing time ranges (each including its start but not its finish)
+        """
+        missing = []
+
+        for chunk_start, chunk_finish in get_chunks(start, finish, chunk_duration):
+            if self.data_cache.has(self._get_chunk_key(key, chunk_start, chunk_duration)):
+                continue
+
+            if missing and missing[-1][1] == chunk_start:
+                missing[-1] = (missing[-1][0], chunk_finish)
+            else:
+                missing.append((chunk_start, chunk_finish))
+
+        return missing
+
+    def set(self, key, df, start, finish, chunk_duration):
+        """Cache the settled chunks of data queried for a time range made up of whole chunks.
+
+        :param dict key: the fields identifying the time series
+        :param pandas.DataFrame df: the data, with a `datetime` column
+        :param datetime.datetime start: the start of the time range the data was queried for (the start of a chunk)
+        :param datetime.datetime finish: the finish of the time range the data was queried for (the finish of a chunk)
+        :param datetime.timedelta chunk_duration:
+        :return None:
+        """
+        settled_before = dt.datetime.utcnow() - self.settling_time
+        expires = time.time() + self.lifetime.total_seconds() if self.lifetime else None
+        chunks_to_cache = {}
+        chunks_metadata = {}
+
+        for chunk_start, chunk_finish in get_chunks(start, finish - chunk_duration, chunk_duration):
+            if chunk_finish > settled_before:
+                break
+
+            if df.empty:
+                chunk = df
+            else:
+                chunk = df[(df["datetime"] >= chunk_start) & (df["datetime"] < chunk_finish)].reset_index(drop=True)
+
+            chunk_key = self._get_chunk_key(key, chunk_start, chunk_duration)
+            chunks_to_cache[chunk_key] = chunk
+
+            chunks_metadata[chunk_key] = {
+                **key,
+                "chunk_start": chunk_start.isoformat(),
+                "chunk_duration": chunk_duration.total_seconds(),
+                "expires": expires,
+            }
+
+        if chunks_to_cache:
+            self.data_cache.set_many(chunks_to_cache, metadata=chunks_metadata)
+            logger.debug("Cached %d %s chunks for %r.", len(chunks_to_cache), chunk_duration, key)
+
+    def delete(self, key, start, finish, chunk_duration):
+        """Remove the cached chunks overlapping the time window so they're queried again.
+
+        :param dict key: the fields identifying the time series
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param datetime.timedelta chunk_duration:
+        :return None:
+        """
+        chunks = get_chunks(start, finish, chunk_duration)
+
+        for chunk_start, _ in chunks:
+            self.data_cache.delete(self._get_chunk_key(key, chunk_start, chunk_duration))
+
+        logger.debug("Removed up to %d %s chunks for %r from the cache.", len(chunks), chunk_duration, key)
+
+    def _get_chunk_key(self, key, chunk_start, chunk_duration):
+        """Get the cache key for a chunk.
+
+        :param dict key:
+        :param datetime.datetime chunk_start:
+        :param datetime.timedelta chunk_duration:
+        :return str:
+        """
+        fields = ":".join(f"{name}={value}" for name, value in sorted(key.items()))
+        return f"chunk:{fields}:{int(chunk_duration.total_seconds())}:{chunk_start.isoformat()}"
+
+
+def get_chunk_duration(start, finish):
+    """Get the duration of the chunks to split the time window into.
+
+    :param datetime.datetime start:
+    :param datetime.datetime finish:
+    :return datetime.timedelta|None: the chunk duration, or `None` if the window is too long to split into chunks
+    """
+    for maximum_window_duration, chunk_duration in CHUNK_DURATIONS:
+        if finish - start <= maximum_window_duration:
+            return chunk_duration
+
+    return None
+
+
+def get_chunks(start, finish, chunk_duration):
+    """Get the start and finish of each chunk overlapping the time window. Chunks are aligned to whole multiples of the
+    chunk duration since the Unix epoch.
+
+    :param datetime.datetime start:
+    :param datetime.datetime finish:
+    :param datetime.timedelta chunk_duration:
+    :return list((datetime.datetime, datetime.datetime)):
+    """
+    chunk_start = EPOCH + ((start - EPOCH) // chunk_duration) * chunk_duration
+    chunks = []
+
+    while chunk_start <= finish:
+        chunks.append((chunk_start, chunk_start + chunk_duration))
+        chunk_start += chunk_duration
+
+    return chunks
+
+
+def combine_chunks(chunks, start, finish):
+    """Combine data chunks into a single dataframe covering the time window.
+
+    :param iter(pandas.DataFrame) chunks: the chunks, each with a `datetime` column
+    :param datetime.datetime start:
+    :param datetime.datetime finish:
+    :return pandas.DataFrame:
+    """
+    chunks = [chunk for chunk in chunks if not chunk.empty]
+
+    if not chunks:
+        return pd.DataFrame()
+
+    df = pd.concat(chunks).sort_values("datetime", kind="stable")
+    return df[(df["datetime"] >= start) & (df["datetime"] <= finish)].reset_index(drop=True)
@@ -0,0 +1,189 @@
+import functools
+import hashlib
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def memoize_coalesced(cache, timeout, lock_timeout=300, poll_interval=0.2, store=None, unless=None):
+    """Memoize the decorated function in the cache (like `flask_caching.Cache.memoize`) and coalesce concurrent calls
+    with the same arguments. The first caller takes a lock in the cache and runs the function; other callers - in any
+    thread, gunicorn worker or Cloud Run instance sharing the cache backend - wait for its result to appear in the
+    cache instead of running the function (e.g. a BigQuery query) again. If the lock's holder doesn't produce a result
+    within `lock_timeout` seconds (e.g. because its process died), the waiting caller runs the function itself.
+
+    The decorated function must not return `None`. Its cached result for some arguments can be got without calling it
+    by calling its `get_cached` method with the same arguments, and removed by calling its `invalidate` method. Calls
+    for which `unless` returns `True` bypass the cache (like `flask_caching.Cache.memoize`'s `unless`).
+
+    :param flask_caching.Cache cache: the cache to store the results and locks in
+    :param int timeout: the number of seconds to cache each result for (`0` means forever)
+    :param int lock_timeout: the maximum number of seconds to wait for another caller's result
+    :param float poll_interval: the number of seconds to wait between checks for another caller's result
+    :param any|None store: if given, store the results here instead of in the cache (e.g. a `dashboard.data_cache.DataFrameResultStore`); it must have the cache's `get`, `set` and `delete` methods
+    :param callable|None unless: if given, a function called with the decorated function's arguments that returns `True` if the call's result shouldn't be cached
+    :return callable: the decorator
+    """
+
+    store = store or cache
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if unless is not None and unless(*args, **kwargs):
+                return function(*args, **kwargs)
+
+            key = _make_cache_key(function, args, kwargs)
+            lock_key = f"{key}:lock"
+            deadline = time.monotonic() + lock_timeout
+
+            while True:
+                result = store.get(key)
+
+                if result is not None:
+                    return result
+
+                if cache.add(lock_key, True, timeout=lock_timeout):
+                    break
+
+                if time.monotonic() > deadline:
+                    logger.warning("Timed out waiting for another caller of %r - calling it again.", function.__name__)
+                    break
+
+                time.sleep(poll_interval)
+
+            try:
+                result = function(*args, **kwargs)
+                store.set(key, result, timeout=timeout)
+            finally:
+                cache.delete(lock_key)
+
+            return result
+
+        def invalidate(*args, **kwargs):
+            """Remove the cached result for the given arguments so the next call runs the function again.
+
+            :return None:
+            """
+            store.delete(_make_cache_key(function, args, kwargs))
+
+        def get_cached(*args, **kwargs):
+            """Get the cached result for the given arguments without calling the function.
+
+            :return any: the cached result, or `None` if there isn't one
+            """
+            return store.get(_make_cache_key(function, args, kwargs))
+
+        wrapper.invalidate = invalidate
+        wrapper.get_cached = get_cached
+        return wrapper
+
+    return decorator
+
+
+def _make_cache_key(function, args, kwargs):
+    """Make a cache key for a call of the function that's the same in every process.
+
+    :param callable function:
+    :param tuple args:
+    :param dict kwargs:
+    :return str:
+    """
+    arguments = repr((args, sorted(kwargs.items())))
+    return f"{function.__module__}.{function.__qualname__}:{hashlib.sha1(arguments.encode()).hexdigest()}"
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls of a function with the same arguments within this process. While a call is in
+    flight, any identical calls made from other threads wait for it to finish and get its result (or exception) instead
+    of calling the function again. Unlike `memoize_coalesced`, results aren't cached and waiting threads are woken as
+    soon as the result is ready.
+
+    :return None:
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def call(self, function, *args, **kwargs):
+        """Call the function with the given arguments or, if an identical call is already in flight, wait for its
+        result.
+
+        :param callable function:
+        :return any: the function's result
+        """
+        key = (function.__module__, function.__qualname__, repr(args), repr(sorted(kwargs.items())))
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.debug("Waiting for identical in-flight call of %r.", function.__qualname__)
+            call.finished.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.finished.set()
+
+        return call.result
+
+    def wrap(self, instance):
+        """Wrap the instance so that calls of its methods go through this single-flight group.
+
+        :param any instance:
+        :return _SingleFlightProxy:
+        """
+        return _SingleFlightProxy(self, instance)
+
+
+class _Call:
+    """An in-flight call of a function.
+
+    :return None:
+    """
+
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SingleFlightProxy:
+    """A proxy for an instance whose method calls go through a single-flight group.
+
+    :param SingleFlight single_flight:
+    :param any instance:
+    :return None:
+    """
+
+    def __init__(self, single_flight, instance):
+        self._single_flight = single_flight
+        self._instance = instance
+
+    def __getattr__(self, name):
+        attribute = getattr(self._instance, name)
+
+        if not callable(attribute):
+            return attribute
+
+        return functools.partial(self._single_flight.call, attribute)
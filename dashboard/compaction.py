@@ -0,0 +1,69 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+# Columns with only a few distinct values that are stored as categoricals.
+CATEGORICAL_COLUMNS = ("node_id", "installation_reference")
+
+
+def compact_dataframe(df):
+    """Convert a dataframe of sensor data to a compact representation: 64-bit float columns become 32-bit floats (about
+    seven significant figures, more than the sensors measure), the identifying columns (e.g. node IDs) become
+    categoricals, and datetimes held as objects become `datetime64[ns]` (epoch nanoseconds). The index is converted in
+    the same way. Arrow preserves these types, so they're kept through the data caches.
+
+    :param pandas.DataFrame df:
+    :return pandas.DataFrame:
+    """
+    conversions = {}
+
+    for column, dtype in df.dtypes.items():
+        if dtype == np.float64:
+            conversions[column] = np.float32
+        elif column in CATEGORICAL_COLUMNS and not isinstance(dtype, pd.CategoricalDtype):
+            conversions[column] = "category"
+        elif column == "datetime" and dtype == object:
+            conversions[column] = "datetime64[ns]"
+
+    if conversions:
+        df = df.astype(conversions)
+
+    if df.index.dtype == object and df.index.name == "datetime":
+        df.index = pd.DatetimeIndex(df.index)
+
+    return df
+
+
+def get_memory_usage(df):
+    """Get the number of bytes a dataframe uses, including the contents of any object columns.
+
+    :param pandas.DataFrame df:
+    :return int:
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def log_memory_report(original, compacted, description):
+    """Log how much memory compacting a dataframe saved.
+
+    :param pandas.DataFrame original: the dataframe before compaction
+    :param pandas.DataFrame compacted: the dataframe after compaction
+    :param str description: a description of the data (e.g. which query it came from)
+    :return None:
+    """
+    original_size = get_memory_usage(original)
+    compacted_size = get_memory_usage(compacted)
+
+    logger.info(
+        "Compacted %d rows of %s from %.2f MB to %.2f MB (%.0f%% saved).",
+        len(compacted),
+        description,
+        original_size / 1024**2,
+        compacted_size / 1024**2,
+        100 * (1 - compacted_size / original_size) if original_size else 0,
+    )
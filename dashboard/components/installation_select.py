@@ -1,14 +1,11 @@
 from dash import dcc
 
-from aerosense_tools.queries import BigQuery
-
 
 def InstallationSelect(current_installation_reference=None):
-    installations = BigQuery().get_installations()
-
+    # The options are filled in by a callback so the layout can be served without waiting for BigQuery.
     return dcc.Dropdown(
-        options=installations,
+        options=[],
         id="installation-select",
-        value=current_installation_reference or installations[0]["value"],
+        value=current_installation_reference,
         persistence=True,
     )
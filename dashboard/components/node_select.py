@@ -1,9 +1,13 @@
 from dash import dcc
 
 
+# The IDs of the nodes an installation can have.
+NODE_IDS = ["1", "2", "3", "4", "5"]
+
+
 def NodeSelect():
     return dcc.Dropdown(
-        options=["1", "2", "3", "4", "5"],
+        options=NODE_IDS,
         id="node-select",
         persistence=True,
     )
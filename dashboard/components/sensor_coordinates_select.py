@@ -1,14 +1,10 @@
 from dash import dcc
 
-from aerosense_tools.queries import BigQuery
-
 
 def SensorCoordinatesSelect():
-    sensor_coordinates = BigQuery().get_sensor_coordinates()
-
+    # The options are filled in by a callback so the layout can be served without waiting for BigQuery.
     return dcc.Dropdown(
-        options=sensor_coordinates["reference"],
+        options=[],
         id="sensor-coordinates-select",
-        value=sensor_coordinates.iloc[0]["reference"],
         persistence=True,
     )
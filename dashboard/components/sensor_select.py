@@ -1,10 +1,11 @@
 from dash import dcc
 
 
-def SensorSelect(sensor_names):
+def SensorSelect(sensor_names=None):
+    # If no sensor names are given, the options are filled in by a callback.
     return dcc.Dropdown(
-        options=sensor_names,
+        options=sensor_names or [],
         id="y-axis-select",
-        value=sensor_names[0],
+        value=sensor_names[0] if sensor_names else None,
         persistence=True,
     )
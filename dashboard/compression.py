@@ -0,0 +1,55 @@
+import gzip
+import logging
+
+import flask
+
+
+logger = logging.getLogger(__name__)
+
+
+# The types of response that are compressed. Images and fonts are already compressed.
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+# Responses smaller than this many bytes fit in a single network packet, so compressing them gains nothing.
+MINIMUM_COMPRESSED_SIZE = 1400
+
+
+def compress_response(response, compression_level=6):
+    """Compress the response with gzip if the client accepts it and it's worth compressing. Streamed responses (e.g.
+    the live data server-sent events) and files sent directly from disk are left as they are. This is meant to be
+    registered as an `after_request` function of the Flask server.
+
+    :param flask.Response response:
+    :param int compression_level: the gzip compression level from 1 (fastest) to 9 (smallest)
+    :return flask.Response: the response
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "gzip" not in flask.request.headers.get("Accept-Encoding", "").lower()
+    ):
+        return response
+
+    data = response.get_data()
+
+    if len(data) < MINIMUM_COMPRESSED_SIZE:
+        return response
+
+    compressed_data = gzip.compress(data, compresslevel=compression_level)
+    response.set_data(compressed_data)
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Content-Length"] = str(len(compressed_data))
+    response.vary.add("Accept-Encoding")
+
+    logger.debug("Compressed %s response from %d to %d bytes.", response.mimetype, len(data), len(compressed_data))
+    return response
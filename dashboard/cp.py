@@ -0,0 +1,177 @@
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_sensor_positions(sensor_coordinates, sensor_coordinates_reference):
+    """Get the chordwise and thickness-wise positions of the barometers for the given sensor coordinates reference.
+
+    :param pandas.DataFrame sensor_coordinates: the sensor coordinates (see `dashboard.reference_data.ReferenceData.get_sensor_coordinates`)
+    :param str sensor_coordinates_reference:
+    :raise ValueError: if there are no sensor coordinates with the reference
+    :return (numpy.ndarray, numpy.ndarray): the x and y positions of the barometers
+    """
+    matching_coordinates = sensor_coordinates[sensor_coordinates["reference"] == sensor_coordinates_reference]
+
+    if matching_coordinates.empty:
+        raise ValueError(f"There are no sensor coordinates with the reference {sensor_coordinates_reference!r}.")
+
+    geometry = matching_coordinates["geometry"].iloc[0]
+
+    if isinstance(geometry, str):
+        geometry = json.loads(geometry)
+
+    return np.asarray(geometry["xPos"], dtype=float), np.asarray(geometry["yPos"], dtype=float)
+
+
+def get_second_boundaries(datetimes, start, number_of_seconds):
+    """Get the positions in the sorted datetimes of the boundaries between the seconds of a time window, where second
+    `i` is the half-open interval from `i - 0.5` to `i + 0.5` seconds after the start of the window. The rows for second
+    `i` are then `boundaries[i]:boundaries[i + 1]`, so selecting them is a slice rather than a comparison of every
+    datetime.
+
+    :param pandas.DatetimeIndex|numpy.ndarray datetimes: the datetimes, sorted in ascending order
+    :param datetime.datetime start: the start of the time window
+    :param int number_of_seconds: the number of seconds in the time window
+    :return numpy.ndarray: the `number_of_seconds + 2` boundary positions
+    """
+    edges = pd.Timestamp(start) + pd.to_timedelta(np.arange(number_of_seconds + 2) - 0.5, unit="s")
+    return np.searchsorted(np.asarray(datetimes, dtype="datetime64[ns]"), edges.to_numpy(), side="left")
+
+
+def compute_cp(pressure_data, air_density, u, p_inf):
+    """Compute the pressure coefficient (Cp) of every sensor at every time in a single array operation.
+
+    :param pandas.DataFrame pressure_data: the pressures in Pa, indexed by datetime with one column per sensor
+    :param float air_density: the air density in kg/m^3
+    :param float u: the free stream velocity in m/s
+    :param float p_inf: the free stream pressure in Pa
+    :return pandas.DataFrame: the Cp with the same index (time) and columns (sensors) as the pressure data
+    """
+    cp = (pressure_data.to_numpy(dtype=float) - p_inf) / (0.5 * air_density * u**2)
+    return pd.DataFrame(cp, index=pressure_data.index, columns=pressure_data.columns)
+
+
+def get_mean_per_second(data, start, number_of_seconds):
+    """Get the mean of each column for each second of a time window in a single pass. The mean for second `i` is over
+    the half-open interval from `i - 0.5` to `i + 0.5` seconds after the start of the window. Missing values are
+    ignored.
+
+    :param pandas.DataFrame data: the data, indexed by datetime (ideally already sorted)
+    :param datetime.datetime start: the start of the time window
+    :param int number_of_seconds: the number of seconds in the time window
+    :return pandas.DataFrame: the mean of each column for each second from `0` to `number_of_seconds` inclusive (rows); seconds with no data are `NaN`
+    """
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index(kind="stable")
+
+    boundaries = get_second_boundaries(data.index, start, number_of_seconds)
+    first, last = boundaries[0], boundaries[-1]
+    values = data.to_numpy(dtype=float)[first:last]
+    boundaries -= first
+
+    sums = np.full((number_of_seconds + 1, values.shape[1]), np.nan)
+    counts = np.zeros_like(sums)
+    non_empty = np.diff(boundaries) > 0
+
+    if non_empty.any():
+        # `reduceat` sums from each boundary to the next, so it's only given the boundaries of non-empty seconds.
+        present = ~np.isnan(values)
+        sums[non_empty] = np.add.reduceat(np.where(present, values, 0), boundaries[:-1][non_empty], axis=0)
+        counts[non_empty] = np.add.reduceat(present, boundaries[:-1][non_empty], axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    return pd.DataFrame(means, index=np.arange(number_of_seconds + 1), columns=data.columns)
+
+
+def create_cp_figure(x_positions, cp_minimum, cp_maximum):
+    """Create an empty Cp plot for the given sensor positions. The Cp values are filled in per second in the browser.
+
+    :param iter(float) x_positions: the chordwise positions of the sensors
+    :param float cp_minimum: the lowest Cp to show
+    :param float cp_maximum: the highest Cp to show
+    :return plotly.graph_objs.Figure:
+    """
+    figure = go.Figure(go.Scatter(x=list(x_positions), y=[], mode="markers", name="Cp"))
+
+    # Negative Cp (suction) is conventionally plotted upwards.
+    figure.update_layout(
+        xaxis_title="Chordwise position",
+        yaxis_title="Cp",
+        yaxis_range=[cp_maximum, cp_minimum],
+        uirevision="cp",
+    )
+
+    return figure
+
+
+def create_cp_envelope_figure(x_positions, cp, cp_minimum, cp_maximum):
+    """Plot the mean Cp of each sensor over a time window with error bars spanning its minimum and maximum.
+
+    :param iter(float) x_positions: the chordwise positions of the sensors
+    :param pandas.DataFrame cp: the Cp of each sensor (columns) at each time (rows)
+    :param float cp_minimum: the lowest Cp to show
+    :param float cp_maximum: the highest Cp to show
+    :return plotly.graph_objs.Figure:
+    """
+    minimum = cp.min().to_numpy()
+    mean = cp.mean().to_numpy()
+    maximum = cp.max().to_numpy()
+
+    figure = go.Figure(
+        go.Scatter(
+            x=list(x_positions),
+            y=mean,
+            mode="markers",
+            name="Mean Cp",
+            error_y={"type": "data", "symmetric": False, "array": maximum - mean, "arrayminus": mean - minimum},
+        )
+    )
+
+    figure.update_layout(
+        title="Cp envelope (minimum, mean and maximum over the time window)",
+        xaxis_title="Chordwise position",
+        yaxis_title="Cp",
+        yaxis_range=[cp_maximum, cp_minimum],
+    )
+
+    return figure
+
+
+def create_cp_heatmap_figure(cp, cp_minimum, cp_maximum, max_times=1000):
+    """Plot the Cp of each sensor over a time window as a heatmap. If there are more than `max_times` times, the Cp is
+    averaged over consecutive groups of times to reduce the resolution of the time axis to at most `max_times`.
+
+    :param pandas.DataFrame cp: the Cp of each sensor (columns) at each time (rows)
+    :param float cp_minimum: the lowest Cp to show
+    :param float cp_maximum: the highest Cp to show
+    :param int max_times: the maximum number of times to plot
+    :return plotly.graph_objs.Figure:
+    """
+    if len(cp) > max_times:
+        groups = np.arange(len(cp)) // int(np.ceil(len(cp) / max_times))
+        times = cp.index[np.r_[0, np.flatnonzero(np.diff(groups)) + 1]]
+        cp = cp.groupby(groups).mean().set_axis(times)
+
+    figure = go.Figure(
+        go.Heatmap(
+            x=cp.index,
+            y=list(cp.columns),
+            z=cp.to_numpy().T,
+            zmin=cp_minimum,
+            zmax=cp_maximum,
+            colorscale="RdBu",
+            colorbar={"title": "Cp"},
+        )
+    )
+
+    figure.update_layout(title="Cp over the time window", xaxis_title="Time", yaxis_title="Sensor")
+    return figure
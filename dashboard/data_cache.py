@@ -0,0 +1,470 @@
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.feather
+
+
+logger = logging.getLogger(__name__)
+
+
+METADATA_KEY = b"dashboard"
+FILE_EXTENSION = ".arrow"
+
+
+class ArrowDataCache:
+    """A size-capped, least-recently-used cache of dataframes stored on disk as uncompressed Arrow IPC (Feather) files.
+    Cached dataframes are read back memory-mapped (optionally only some of their columns), which avoids unpickling the
+    whole object on every hit. Each file's key and metadata are stored in its schema, so the directory itself is the
+    index of what's cached and it can be shared by several processes (e.g. gunicorn workers). A file's modification
+    time is updated whenever it's read so the least recently used files are evicted first. The numbers of hits, misses
+    and evictions in this process are counted (see `stats`).
+
+    :param str directory: the directory to store the cache files in
+    :param int max_size: the maximum total size of the cache files in bytes
+    :return None:
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._scan())
+
+    def get(self, key, columns=None):
+        """Get the dataframe cached under the key.
+
+        :param str key:
+        :param list(str)|None columns: if given, only read these columns
+        :return pandas.DataFrame|None: the dataframe, or `None` if it isn't cached
+        """
+        return self.get_with_metadata(key, columns)[0]
+
+    def get_with_metadata(self, key, columns=None):
+        """Get the dataframe cached under the key along with the metadata it was cached with.
+
+        :param str key:
+        :param list(str)|None columns: if given, only read these columns
+        :return (pandas.DataFrame|None, dict|None): the dataframe and its metadata, or `None` for both if it isn't cached
+        """
+        path = self._get_path(key)
+
+        try:
+            table = pyarrow.feather.read_table(path, columns=columns, memory_map=True)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+
+            return None, None
+
+        with self._lock:
+            self.hits += 1
+
+        return table.to_pandas(split_blocks=True), _get_metadata(table)
+
+    def has(self, key):
+        """Check whether a dataframe is cached under the key without reading it.
+
+        :param str key:
+        :return bool:
+        """
+        return os.path.exists(self._get_path(key))
+
+    def get_many(self, *keys):
+        """Get the dataframes cached under the keys.
+
+        :param str keys:
+        :return list(pandas.DataFrame|None): the dataframes, with `None` for any keys that aren't cached
+        """
+        return [df for df, _ in self.get_many_with_metadata(*keys)]
+
+    def get_many_with_metadata(self, *keys):
+        """Get the dataframes cached under the keys along with the metadata they were cached with.
+
+        :param str keys:
+        :return list((pandas.DataFrame|None, dict|None)): the dataframes and their metadata, with `None` for both for any keys that aren't cached
+        """
+        return [self.get_with_metadata(key) for key in keys]
+
+    def set(self, key, df, metadata=None):
+        """Cache the dataframe under the key, evicting the least recently used dataframes if the cache is full.
+
+        :param str key:
+        :param pandas.DataFrame df:
+        :param dict|None metadata: JSON-serialisable metadata describing the dataframe, stored with it
+        :return None:
+        """
+        table = _to_table(df, key, metadata)
+
+        # Write to a temporary file first so other processes never read a partially-written file.
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(file_descriptor)
+        pyarrow.feather.write_feather(table, temporary_path, compression="uncompressed")
+        size = os.path.getsize(temporary_path)
+        path = self._get_path(key)
+
+        # The file being overwritten (if any) no longer counts towards the size of the cache.
+        try:
+            replaced_size = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_size = 0
+
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            self._size += size - replaced_size
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def set_many(self, mapping, metadata=None):
+        """Cache each dataframe in the mapping under its key.
+
+        :param dict(str, pandas.DataFrame) mapping:
+        :param dict(str, dict)|None metadata: the metadata for each key
+        :return None:
+        """
+        metadata = metadata or {}
+
+        for key, df in mapping.items():
+            self.set(key, df, metadata=metadata.get(key))
+
+    def delete(self, key):
+        """Remove the dataframe cached under the key if there is one.
+
+        :param str key:
+        :return None:
+        """
+        path = self._get_path(key)
+
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+            self._size -= size
+
+    def stats(self):
+        """Get the cache's statistics. The size is the total size of the cache files as of the last write by this
+        process.
+
+        :return dict: the numbers of hits, misses and evictions in this process, and the size and maximum size of the cache in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": self._size,
+                "max_size": self.max_size,
+            }
+
+    def _evict(self):
+        """Remove the least recently used cache files until the cache is within its maximum size. The cache directory
+        is rescanned so that files written or removed by other processes are accounted for.
+
+        :return None:
+        """
+        entries = sorted(self._scan(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        number_of_evictions = 0
+
+        for entry in entries:
+            if self._size <= self.max_size:
+                break
+
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+            self._size -= entry.stat().st_size
+            number_of_evictions += 1
+
+        self.evictions += number_of_evictions
+        logger.debug("Evicted %d files from the data cache at %r.", number_of_evictions, self.directory)
+
+    def _scan(self):
+        """Get the directory entries of the cache files.
+
+        :return list(os.DirEntry):
+        """
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(FILE_EXTENSION):
+                continue
+
+            try:
+                entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append(entry)
+
+        return entries
+
+    def _get_path(self, key):
+        """Get the path of the cache file for the key.
+
+        :param str key:
+        :return str:
+        """
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + FILE_EXTENSION)
+
+
+class SharedArrowDataCache:
+    """A cache of dataframes stored as Arrow IPC streams in a Flask-Caching backend shared between processes and
+    machines (e.g. `RedisCache` or `MemcachedCache`), so every gunicorn worker and Cloud Run instance reuses the same
+    cached data. Cached dataframes are read back without copying their buffers. Eviction is left to the backend (e.g.
+    Redis's `maxmemory-policy allkeys-lru`). With `SimpleCache`, this works as an in-memory, single-process cache
+    that's useful for testing. The numbers of hits and misses in this process are counted (see `stats`).
+
+    :param flask_caching.Cache cache: the shared cache
+    :param str prefix: the prefix for the keys of the dataframes in the shared cache
+    :param int timeout: the number of seconds to cache each dataframe for (`0` means until the backend evicts it)
+    :return None:
+    """
+
+    def __init__(self, cache, prefix="data:", timeout=0):
+        self.cache = cache
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, columns=None):
+        """Get the dataframe cached under the key.
+
+        :param str key:
+        :param list(str)|None columns: if given, only get these columns
+        :return pandas.DataFrame|None: the dataframe, or `None` if it isn't cached
+        """
+        return self._from_bytes(self.cache.get(self._get_shared_key(key)), columns)[0]
+
+    def get_with_metadata(self, key, columns=None):
+        """Get the dataframe cached under the key along with the metadata it was cached with.
+
+        :param str key:
+        :param list(str)|None columns: if given, only get these columns
+        :return (pandas.DataFrame|None, dict|None): the dataframe and its metadata, or `None` for both if it isn't cached
+        """
+        return self._from_bytes(self.cache.get(self._get_shared_key(key)), columns)
+
+    def has(self, key):
+        """Check whether a dataframe is cached under the key without getting it.
+
+        :param str key:
+        :return bool:
+        """
+        return self.cache.has(self._get_shared_key(key))
+
+    def get_many(self, *keys):
+        """Get the dataframes cached under the keys in a single request to the shared cache.
+
+        :param str keys:
+        :return list(pandas.DataFrame|None): the dataframes, with `None` for any keys that aren't cached
+        """
+        return [df for df, _ in self.get_many_with_metadata(*keys)]
+
+    def get_many_with_metadata(self, *keys):
+        """Get the dataframes cached under the keys along with the metadata they were cached with in a single request
+        to the shared cache.
+
+        :param str keys:
+        :return list((pandas.DataFrame|None, dict|None)): the dataframes and their metadata, with `None` for both for any keys that aren't cached
+        """
+        return [self._from_bytes(value) for value in self.cache.get_many(*map(self._get_shared_key, keys))]
+
+    def set(self, key, df, metadata=None):
+        """Cache the dataframe under the key.
+
+        :param str key:
+        :param pandas.DataFrame df:
+        :param dict|None metadata: JSON-serialisable metadata describing the dataframe
+        :return None:
+        """
+        self.cache.set(self._get_shared_key(key), self._to_bytes(key, df, metadata), timeout=self.timeout)
+
+    def set_many(self, mapping, metadata=None):
+        """Cache each dataframe in the mapping under its key in a single request to the shared cache.
+
+        :param dict(str, pandas.DataFrame) mapping:
+        :param dict(str, dict)|None metadata: the metadata for each key
+        :return None:
+        """
+        metadata = metadata or {}
+
+        self.cache.set_many(
+            {self._get_shared_key(key): self._to_bytes(key, df, metadata.get(key)) for key, df in mapping.items()},
+            timeout=self.timeout,
+        )
+
+    def delete(self, key):
+        """Remove the dataframe cached under the key if there is one.
+
+        :param str key:
+        :return None:
+        """
+        self.cache.delete(self._get_shared_key(key))
+
+    def stats(self):
+        """Get the cache's statistics. Evictions and the cache's size are managed by the backend, so aren't included.
+
+        :return dict: the numbers of hits and misses in this process
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _get_shared_key(self, key):
+        """Get the key to use in the shared cache. Keys are hashed so they're valid for any backend (e.g. memcached
+        doesn't allow spaces or keys longer than 250 characters).
+
+        :param str key:
+        :return str:
+        """
+        return self.prefix + hashlib.sha1(key.encode()).hexdigest()
+
+    def _to_bytes(self, key, df, metadata):
+        """Serialise the dataframe as an Arrow IPC stream.
+
+        :param str key:
+        :param pandas.DataFrame df:
+        :param dict|None metadata:
+        :return bytes:
+        """
+        table = _to_table(df, key, metadata)
+        sink = pa.BufferOutputStream()
+
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        return sink.getvalue().to_pybytes()
+
+    def _from_bytes(self, value, columns=None):
+        """Deserialise a dataframe and its metadata from an Arrow IPC stream.
+
+        :param bytes|None value:
+        :param list(str)|None columns: if given, only deserialise these columns
+        :return (pandas.DataFrame|None, dict|None):
+        """
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if value is None:
+            return None, None
+
+        table = pa.ipc.open_stream(pa.py_buffer(value)).read_all()
+
+        if columns is not None:
+            table = table.select(columns)
+
+        return table.to_pandas(split_blocks=True), _get_metadata(table)
+
+
+class DataFrameResultStore:
+    """Store the results of a function that returns a dataframe and an optional duration (e.g. sensor data and the
+    duration of its aggregation buckets) in a data cache, so they can be memoized with `memoize_coalesced` without
+    being pickled. Each result's expiry time is stored with it, and expired results are treated as missing and removed.
+    The results are also subject to the data cache's size limit.
+
+    :param ArrowDataCache|SharedArrowDataCache data_cache:
+    :param str prefix: the prefix for the keys of the results in the data cache
+    :return None:
+    """
+
+    def __init__(self, data_cache, prefix="result:"):
+        self.data_cache = data_cache
+        self.prefix = prefix
+
+    def get(self, key):
+        """Get the result stored under the key.
+
+        :param str key:
+        :return (pandas.DataFrame, datetime.timedelta|None)|None: the result, or `None` if it isn't stored or has expired
+        """
+        df, metadata = self.data_cache.get_with_metadata(self.prefix + key)
+
+        if df is None:
+            return None
+
+        expires = metadata.get("expires")
+
+        if expires is not None and time.time() > expires:
+            self.delete(key)
+            return None
+
+        duration = metadata.get("duration")
+        return df, (dt.timedelta(seconds=duration) if duration is not None else None)
+
+    def set(self, key, result, timeout=None):
+        """Store the result under the key.
+
+        :param str key:
+        :param (pandas.DataFrame, datetime.timedelta|None) result:
+        :param int|float|None timeout: the number of seconds to store the result for (`0` or `None` means until it's evicted)
+        :return None:
+        """
+        df, duration = result
+
+        metadata = {
+            "duration": duration.total_seconds() if duration is not None else None,
+            "expires": time.time() + timeout if timeout else None,
+        }
+
+        self.data_cache.set(self.prefix + key, df, metadata=metadata)
+
+    def delete(self, key):
+        """Remove the result stored under the key if there is one.
+
+        :param str key:
+        :return None:
+        """
+        self.data_cache.delete(self.prefix + key)
+
+
+def _to_table(df, key, metadata):
+    """Convert the dataframe to an Arrow table with the key and metadata stored in its schema.
+
+    :param pandas.DataFrame df:
+    :param str key:
+    :param dict|None metadata:
+    :return pyarrow.Table:
+    """
+    table = pa.Table.from_pandas(df)
+
+    return table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps({"key": key, **(metadata or {})}, default=str).encode(),
+        }
+    )
+
+
+def _get_metadata(table):
+    """Get the metadata stored in the Arrow table's schema, without its key.
+
+    :param pyarrow.Table table:
+    :return dict:
+    """
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    metadata.pop("key", None)
+    return metadata
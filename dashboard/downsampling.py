@@ -0,0 +1,241 @@
+import datetime as dt
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+# Per-point trace attributes that must be downsampled along with the trace's `x` and `y` values.
+PER_POINT_TRACE_ATTRIBUTES = ("text", "hovertext", "customdata")
+
+
+def get_min_max_indices(values, max_points):
+    """Get the indices of the points to keep so that a line plot of the given values looks the same as a line plot of
+    all of them when it's drawn at a resolution of about `max_points / 2` pixels. The values are split into buckets of
+    consecutive points and the positions of the minimum and maximum of each bucket are kept, along with the first and
+    last points and the start of each run of missing (`NaN`) values so that gaps in the signal are still shown.
+
+    :param iter(float) values: the values to downsample
+    :param int max_points: the maximum number of points to keep (excluding the gap markers)
+    :return numpy.ndarray: the sorted indices of the points to keep
+    """
+    values = np.asarray(values, dtype=float)
+    number_of_values = len(values)
+
+    if number_of_values <= max_points:
+        return np.arange(number_of_values)
+
+    bucket_size = int(np.ceil(number_of_values / max(max_points // 2, 1)))
+    number_of_buckets = int(np.ceil(number_of_values / bucket_size))
+    padding = number_of_buckets * bucket_size - number_of_values
+
+    missing = np.isnan(values)
+    lows = np.pad(np.where(missing, np.inf, values), (0, padding), constant_values=np.inf)
+    highs = np.pad(np.where(missing, -np.inf, values), (0, padding), constant_values=-np.inf)
+
+    bucket_offsets = np.arange(number_of_buckets) * bucket_size
+    minima = lows.reshape(number_of_buckets, bucket_size).argmin(axis=1) + bucket_offsets
+    maxima = highs.reshape(number_of_buckets, bucket_size).argmax(axis=1) + bucket_offsets
+    gap_starts = np.flatnonzero(missing & ~np.concatenate(([False], missing[:-1])))
+
+    indices = np.unique(np.concatenate(([0, number_of_values - 1], minima, maxima, gap_starts)))
+    return indices[indices < number_of_values]
+
+
+def downsample_dataframe(df, max_points_per_column, columns=None):
+    """Downsample the rows of a dataframe before it's plotted so each column has at most about `max_points_per_column`
+    points worth keeping (see `get_min_max_indices`). The rows kept are the union of the rows picked for each column,
+    so a plot of any of the columns looks the same as a plot of all the rows, without the figure ever being built from
+    all of them. As the union can contain more rows than the budget, figures should still be passed through
+    `downsample_figure` afterwards, which is cheap once the data has been reduced.
+
+    :param pandas.DataFrame df: the data to downsample, in time order
+    :param int|None max_points_per_column: the point budget for each column; if `None`, the data isn't downsampled
+    :param list(str)|None columns: the columns to pick the rows for; if `None`, all the numeric columns are used
+    :return pandas.DataFrame: the downsampled data
+    """
+    if not max_points_per_column or len(df) <= max_points_per_column:
+        return df
+
+    if columns is None:
+        columns = df.select_dtypes(include="number").columns
+
+    indices = [get_min_max_indices(df[column].to_numpy(dtype=float), max_points_per_column) for column in columns]
+
+    if not indices:
+        return df
+
+    downsampled_df = df.iloc[np.unique(np.concatenate(indices))]
+
+    logger.debug("Downsampled dataframe from %d to %d rows before plotting.", len(df), len(downsampled_df))
+    return downsampled_df
+
+
+def downsample_figure(figure, max_points_per_trace):
+    """Downsample each trace of the figure in place so it has at most about `max_points_per_trace` points (see
+    `get_min_max_indices`). Traces with non-numeric `y` values are left untouched.
+
+    :param plotly.graph_objs.Figure figure: the figure to downsample
+    :param int|None max_points_per_trace: the point budget for each trace; if `None`, the figure isn't downsampled
+    :return plotly.graph_objs.Figure: the downsampled figure
+    """
+    if not max_points_per_trace:
+        return figure
+
+    for trace in figure.data:
+        if getattr(trace, "x", None) is None or getattr(trace, "y", None) is None:
+            continue
+
+        number_of_points = len(trace.y)
+
+        if number_of_points <= max_points_per_trace:
+            continue
+
+        try:
+            indices = get_min_max_indices(trace.y, max_points_per_trace)
+        except (TypeError, ValueError):
+            logger.debug("Skipped downsampling trace %r as it has non-numeric values.", trace.name)
+            continue
+
+        updates = {"x": np.asarray(trace.x)[indices], "y": np.asarray(trace.y)[indices]}
+
+        for attribute in PER_POINT_TRACE_ATTRIBUTES:
+            value = getattr(trace, attribute, None)
+
+            if value is not None and not isinstance(value, str) and len(value) == number_of_points:
+                updates[attribute] = np.asarray(value)[indices]
+
+        trace.update(updates)
+
+        logger.debug(
+            "Downsampled trace %r from %d to %d points.",
+            trace.name,
+            number_of_points,
+            len(indices),
+        )
+
+    return figure
+
+
+class StreamingAggregator:
+    """Aggregate sensor data into time buckets batch by batch as it's downloaded, so the raw data never has to be held
+    in memory all at once. The result is the same as that of `dashboard.queries.BigQuery.get_aggregated_sensor_data`:
+    the minimum, mean and maximum of each data column over each time bucket (aligned to the Unix epoch) and node.
+    Only one row per bucket and node is kept between batches, however many rows are added.
+
+    :param datetime.timedelta bucket_duration:
+    :param list(str) data_columns: the data columns to aggregate (e.g. `["f0", "f1"]`)
+    :return None:
+    """
+
+    def __init__(self, bucket_duration, data_columns):
+        self.bucket_microseconds = max(bucket_duration // dt.timedelta(microseconds=1), 1)
+        self.data_columns = list(data_columns)
+        self.number_of_rows = 0
+        self._aggregates = None
+
+    def add(self, df):
+        """Add a batch of raw sensor data to the aggregates.
+
+        :param pandas.DataFrame df: a batch of raw sensor data with `datetime`, `node_id` and data columns, in any order
+        :return None:
+        """
+        if df.empty:
+            return
+
+        microseconds = df["datetime"].to_numpy().astype("datetime64[us]").astype(np.int64)
+        buckets = pd.Series(microseconds // self.bucket_microseconds, index=df.index, name="bucket")
+        values = df[self.data_columns].astype(float)
+
+        aggregates = values.groupby([buckets, df["node_id"]], dropna=False).agg(["min", "sum", "count", "max"])
+
+        if self._aggregates is not None:
+            aggregates = (
+                pd.concat([self._aggregates, aggregates])
+                .groupby(level=[0, 1])
+                .agg({column: _combine_aggregate(column[1]) for column in aggregates.columns})
+            )
+
+        self._aggregates = aggregates
+        self.number_of_rows += len(df)
+
+    def get_aggregated_data(self):
+        """Get the aggregated data added so far.
+
+        :return pandas.DataFrame: the aggregated data with `datetime` set to the start of each bucket and `f<i>_min`, `f<i>_mean` and `f<i>_max` columns, sorted by datetime and node
+        """
+        columns = [f"{column}_{aggregate}" for column in self.data_columns for aggregate in ("min", "mean", "max")]
+
+        if self._aggregates is None:
+            return pd.DataFrame(columns=["datetime", "node_id"] + columns)
+
+        aggregates = self._aggregates.sort_index()
+        buckets = aggregates.index.get_level_values(0).to_numpy()
+
+        data = {
+            "datetime": (buckets * self.bucket_microseconds).astype("datetime64[us]").astype("datetime64[ns]"),
+            "node_id": aggregates.index.get_level_values(1).to_numpy(),
+        }
+
+        for column in self.data_columns:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = aggregates[(column, "sum")].to_numpy() / aggregates[(column, "count")].to_numpy()
+
+            data[f"{column}_min"] = aggregates[(column, "min")].to_numpy()
+            data[f"{column}_mean"] = mean
+            data[f"{column}_max"] = aggregates[(column, "max")].to_numpy()
+
+        return pd.DataFrame(data)
+
+
+def _combine_aggregate(aggregate):
+    """Get the aggregate that combines partial aggregates of the given kind (e.g. the sum of partial counts).
+
+    :param str aggregate: "min", "sum", "count" or "max"
+    :return str:
+    """
+    return {"min": "min", "sum": "sum", "count": "sum", "max": "max"}[aggregate]
+
+
+def get_envelope(aggregated_data, bucket_duration):
+    """Convert time-bucketed aggregates of sensor data (see `dashboard.queries.BigQuery.get_aggregated_sensor_data`)
+    into the shape of the raw sensor data so they can be preprocessed and plotted in the same way. Each bucket becomes
+    two rows - one at the start of the bucket holding the minimum of each data column and one halfway through it
+    holding the maximum - so the plotted lines cover the full range of the raw data. Empty buckets aren't returned by
+    the aggregation, so a row of missing values is added at the end of each bucket followed by an empty one to show the
+    gap. The rows are too far apart for the gaps to be found by padding them like raw data, so they shouldn't be.
+
+    :param pandas.DataFrame aggregated_data: data with a `datetime` column and `<column>_min`, `<column>_mean` and `<column>_max` columns, sorted by datetime
+    :param datetime.timedelta bucket_duration:
+    :return pandas.DataFrame:
+    """
+    other_columns = [column for column in aggregated_data.columns if not column.endswith(("_min", "_mean", "_max"))]
+
+    minima = _select_aggregate(aggregated_data, other_columns, suffix="_min")
+    maxima = _select_aggregate(aggregated_data, other_columns, suffix="_max")
+    maxima["datetime"] += bucket_duration / 2
+
+    # Allow for bucket start times not being exact multiples of the bucket duration apart.
+    is_followed_by_gap = (minima["datetime"].diff().shift(-1) > bucket_duration * 1.5).to_numpy()
+    gaps = minima[is_followed_by_gap].copy()
+    gaps["datetime"] += bucket_duration
+    data_columns = [column for column in gaps.columns if column not in other_columns]
+    gaps[data_columns] = gaps[data_columns].mask(np.ones(gaps[data_columns].shape, dtype=bool))
+
+    return pd.concat([minima, maxima, gaps]).sort_values("datetime", kind="stable").reset_index(drop=True)
+
+
+def _select_aggregate(aggregated_data, other_columns, suffix):
+    """Select the columns of one aggregate (e.g. the minima) from time-bucketed aggregates of sensor data, removing the
+    aggregate's suffix from their names.
+
+    :param pandas.DataFrame aggregated_data:
+    :param list(str) other_columns: the non-aggregate columns to keep
+    :param str suffix: the suffix of the aggregate's columns (e.g. "_min")
+    :return pandas.DataFrame:
+    """
+    columns = {column: column[: -len(suffix)] for column in aggregated_data.columns if column.endswith(suffix)}
+    return aggregated_data[other_columns + list(columns)].rename(columns=columns)
@@ -0,0 +1,131 @@
+import logging
+import re
+
+import numpy as np
+import plotly.graph_objs as go
+
+from dashboard.downsampling import PER_POINT_TRACE_ATTRIBUTES
+
+
+logger = logging.getLogger(__name__)
+
+
+def remove_redundant_hover_data(figure):
+    """Remove per-point hover data (`text`, `hovertext` and `customdata` arrays) from the figure's traces in place if
+    it isn't shown anywhere. Hover labels then show each point's `x` and `y` values, which are sent anyway, rather than
+    a second copy of them.
+
+    :param plotly.graph_objs.Figure figure:
+    :return plotly.graph_objs.Figure: the figure
+    """
+    for trace in figure.data:
+        templates = " ".join(
+            template
+            for template in (getattr(trace, "hovertemplate", None), getattr(trace, "texttemplate", None))
+            if isinstance(template, str)
+        )
+
+        shows_text = "text" in (getattr(trace, "mode", None) or "")
+        removed = []
+
+        for attribute in PER_POINT_TRACE_ATTRIBUTES:
+            value = getattr(trace, attribute, None)
+
+            if value is None or isinstance(value, str):
+                continue
+
+            if (attribute == "text" and shows_text) or re.search(rf"%{{{attribute}\b", templates):
+                continue
+
+            trace[attribute] = None
+            removed.append(attribute)
+
+        if removed:
+            logger.debug("Removed unused per-point %s from trace %r.", ", ".join(removed), trace.name)
+
+    return figure
+
+
+def use_webgl(figure, point_threshold):
+    """Draw the figure's scatter traces with WebGL (`Scattergl`) instead of SVG if the figure has more than
+    `point_threshold` points in total. Browsers slow down a lot when drawing more than about a hundred thousand SVG
+    points, whereas WebGL copes with millions. Properties that `Scattergl` doesn't support (e.g. spline line shapes)
+    are dropped.
+
+    :param plotly.graph_objs.Figure figure:
+    :param int|None point_threshold: the number of points above which WebGL is used; if `None`, it's never used
+    :return plotly.graph_objs.Figure: the figure
+    """
+    if point_threshold is None:
+        return figure
+
+    number_of_points = sum(len(trace.x) for trace in figure.data if getattr(trace, "x", None) is not None)
+
+    if number_of_points <= point_threshold or not any(isinstance(trace, go.Scatter) for trace in figure.data):
+        return figure
+
+    traces = [
+        go.Scattergl(trace.to_plotly_json(), skip_invalid=True) if isinstance(trace, go.Scatter) else trace
+        for trace in figure.data
+    ]
+
+    # Traces of a different type can't be assigned to the figure's data, so the traces are replaced instead. Each
+    # trace keeps its axes, so subplots are unaffected.
+    figure.data = []
+    figure.add_traces(traces)
+
+    logger.debug("Switched figure with %d points to WebGL.", number_of_points)
+    return figure
+
+
+def use_epoch_milliseconds(figure):
+    """Replace the datetime `x` values of the figure's traces in place with the number of milliseconds since the Unix
+    epoch and make their x-axes date axes so they're still shown as datetimes. Numbers are much shorter than the ISO
+    strings datetimes are otherwise serialised as and are quicker for the browser to parse. Whole milliseconds are sent
+    as integers.
+
+    :param plotly.graph_objs.Figure figure:
+    :return plotly.graph_objs.Figure: the figure
+    """
+    for trace in figure.data:
+        x = getattr(trace, "x", None)
+
+        if x is None or isinstance(x, str):
+            continue
+
+        x = np.asarray(x)
+
+        if x.dtype.kind != "M":
+            continue
+
+        missing = np.isnat(x)
+        nanoseconds = x.astype("datetime64[ns]").astype(np.int64)
+
+        if not missing.any() and (nanoseconds % 10**6 == 0).all():
+            milliseconds = nanoseconds // 10**6
+        else:
+            milliseconds = np.where(missing, np.nan, nanoseconds / 10**6)
+
+        trace.x = milliseconds
+        figure.layout[f"xaxis{(trace.xaxis or 'x')[1:]}"].type = "date"
+
+    return figure
+
+
+def combine_node_figures(figures):
+    """Combine figures of the same sensor's data from different nodes into one figure with a trace for each node and
+    sensor. Each trace stays on the same subplot as in its node's figure, is named after its node and is grouped in the
+    legend with the node's other traces. The layout of the first figure is used.
+
+    :param dict(str, plotly.graph_objs.Figure) figures: the figure for each node, by node ID
+    :return plotly.graph_objs.Figure:
+    """
+    combined_figure = go.Figure(layout=next(iter(figures.values())).layout)
+
+    for node_id, figure in figures.items():
+        for trace in figure.data:
+            trace.update(name=f"Node {node_id}: {trace.name}", legendgroup=f"node-{node_id}")
+
+        combined_figure.add_traces(figure.data)
+
+    return combined_figure
@@ -10,16 +10,50 @@ from dashboard.components.sensor_select import SensorSelect
 from dashboard.components.time_range_select import TimeRangeSelect
 
 
-def create_sensors_tab_layout(app, tab_name, sensor_names, graph_id, data_limit_warning_id):
+def create_sensors_tab_layout(
+    app,
+    tab_name,
+    sensor_names,
+    graph_id,
+    data_limit_warning_id,
+    live_mode=False,
+    progressive_rendering=False,
+):
     """Create the layout corresponding to a sensors tab.
 
     :param dash.Dash app:
     :param str tab_name:
-    :param iter(str) sensor_names:
+    :param list(str)|None sensor_names: the sensors to choose from; if `None`, they're filled in by a callback
     :param str graph_id:
     :param str data_limit_warning_id:
+    :param bool live_mode: if `True`, include a toggle for live mode, which appends new data to the graph as it arrives
+    :param bool progressive_rendering: if `True`, include the stores used to replace an overview of the data plotted in the graph with the full resolution data
     :return list:
     """
+    if live_mode:
+        live_mode_components = [
+            dcc.Checklist(
+                id="live-mode-checklist",
+                options=[{"label": "Live (last minute, updated as new data arrives)", "value": "live"}],
+                value=[],
+            ),
+            html.Span(id=f"{graph_id}-live-status"),
+            # The live query, the datetime of the last plotted row, and the index of each trace.
+            dcc.Store(id=f"{graph_id}-live"),
+        ]
+    else:
+        live_mode_components = []
+
+    if progressive_rendering:
+        progressive_rendering_components = [
+            # The query behind an overview plotted in the graph that's waiting to be replaced by the full resolution
+            # data, and the full resolution figure once it's ready.
+            dcc.Store(id=f"{graph_id}-refinement"),
+            dcc.Store(id=f"{graph_id}-refined"),
+        ]
+    else:
+        progressive_rendering_components = []
+
     return [
         html.Div(
             [
@@ -156,6 +190,7 @@ def create_sensors_tab_layout(app, tab_name, sensor_names, graph_id, data_limit_
                             n_clicks=0,
                         ),
                         html.Br(id="run-session-extraction-output-placeholder"),
+                        *live_mode_components,
                     ],
                     id="buttons-section",
                     className="sidebar-content",
@@ -177,6 +212,9 @@ def create_sensors_tab_layout(app, tab_name, sensor_names, graph_id, data_limit_
                         dcc.Graph(id=graph_id, style={"margin": "0px 20px", "height": "45vh"}),
                     ],
                 ),
+                # The query behind the currently plotted data, used to replot the visible window when zooming.
+                dcc.Store(id=f"{graph_id}-query"),
+                *progressive_rendering_components,
             ],
             className="eight columns",
         ),
@@ -354,6 +392,45 @@ def create_cp_plot_tab_layout(app):
                             id="sensor-coordinates-check-button",
                             n_clicks=0,
                         ),
+                        html.Br(),
+                        html.Br(),
+                        html.Label(html.B("Playback")),
+                        html.Div(
+                            [
+                                html.Div(
+                                    [
+                                        html.Label("Duration (minutes)"),
+                                        dash_daq.NumericInput(
+                                            id="playback-duration-input",
+                                            value=10,
+                                            min=1,
+                                            max=24 * 60,
+                                            size=120,
+                                            persistence=True,
+                                        ),
+                                    ],
+                                    style={"display": "inline-block"},
+                                ),
+                                html.Div(
+                                    [
+                                        html.Label("Frames per second"),
+                                        dash_daq.NumericInput(
+                                            id="playback-frame-rate-input",
+                                            value=5,
+                                            min=1,
+                                            max=30,
+                                            size=120,
+                                            persistence=True,
+                                        ),
+                                    ],
+                                    style={"display": "inline-block"},
+                                ),
+                            ],
+                            style={"margin": "10px 0"},
+                        ),
+                        html.Button("Play", id="playback-button", n_clicks=0),
+                        html.Span(id="playback-time", style={"margin-left": "10px"}),
+                        dcc.Interval(id="playback-interval", interval=200, disabled=True),
                     ],
                     id="buttons-section",
                     className="sidebar-content",
@@ -374,6 +451,31 @@ def create_cp_plot_tab_layout(app):
                         dcc.Graph(id="pressure-profile-graph", style={"margin": "0px 20px", "height": "45vh"}),
                     ],
                 ),
+                dcc.RadioItems(
+                    id="cp-summary-select",
+                    options=[
+                        {"label": "Cp envelope", "value": "envelope"},
+                        {"label": "Cp heatmap", "value": "heatmap"},
+                    ],
+                    value="envelope",
+                    inline=True,
+                    persistence=True,
+                    style={"margin": "0px 20px"},
+                ),
+                dcc.Loading(
+                    [
+                        dcc.Graph(id="cp-summary-graph", style={"margin": "0px 20px", "height": "45vh"}),
+                    ],
+                ),
+                # The Cp profiles for every second of the time window, plotted in the browser as the time slider moves.
+                dcc.Store(id="cp-profiles"),
+                # The playback position (in seconds since the start of the playback period), the last request for a chunk
+                # of playback frames, the last chunk of frames loaded, and the frames buffered for playback (the rest of
+                # the current chunk and the next chunk once it's loaded).
+                dcc.Store(id="playback-position", data=0),
+                dcc.Store(id="playback-request"),
+                dcc.Store(id="playback-frames"),
+                dcc.Store(id="playback-buffer"),
             ],
             className="eight columns",
         ),
@@ -0,0 +1,289 @@
+import collections
+import datetime as dt
+import json
+import logging
+import queue
+import threading
+import time
+
+import flask
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveDataHub:
+    """A hub that fans new sensor data out to every client watching the same stream. Each stream (e.g. an
+    installation, node and sensor) has a single background poller that fetches new rows once per polling interval and
+    pushes them to all of its subscribers, so the number of queries made depends on the number of distinct streams
+    being watched rather than the number of viewers. A poller stops once its stream has had no subscribers (or polling
+    clients) for `idle_timeout` seconds.
+
+    Each subscriber holds a server thread for as long as it's subscribed, so the number of subscribers can be capped;
+    clients turned away can poll for the stream's recent messages instead (see `get_recent_messages`).
+
+    :param callable fetch: a function taking a stream's key and the datetime of the last row fetched for it and returning the new rows as a JSON-serialisable dictionary with a `last_datetime` item, or `None` if there are none
+    :param float interval: the number of seconds between polls of each stream
+    :param float idle_timeout: the number of seconds a stream's poller keeps running without any subscribers
+    :param int replay_length: the number of recent messages of each stream to send to new subscribers so they don't miss rows fetched just before they subscribed
+    :param int max_queue_size: the maximum number of messages waiting for a subscriber before it's considered too slow and is sent no more
+    :param int|None max_subscribers: the maximum number of subscribers across all streams; if `None`, there's no limit
+    :return None:
+    """
+
+    def __init__(self, fetch, interval=3, idle_timeout=30, replay_length=20, max_queue_size=100, max_subscribers=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.replay_length = replay_length
+        self.max_queue_size = max_queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def subscribe(self, key, since):
+        """Subscribe to a stream, starting its poller if it isn't already running. If the stream is already running
+        but its recent messages don't go back as far as the subscriber's last row, the rows in between are fetched for
+        the subscriber and sent first.
+
+        :param tuple key: the key of the stream
+        :param datetime.datetime since: the datetime of the last row the subscriber already has
+        :return queue.Queue|None: the queue the stream's messages (JSON strings) are put on (`None` is put on it if the subscriber is dropped), or `None` if the hub already has the maximum number of subscribers
+        """
+        subscription = queue.Queue(maxsize=self.max_queue_size)
+
+        with self._lock:
+            if self._is_full():
+                return None
+
+        backfill = self._get_backfill(key, since)
+
+        with self._lock:
+            if self._is_full():
+                return None
+
+            stream = self._get_stream(key, since)
+
+            if backfill is not None:
+                subscription.put_nowait(backfill)
+
+            for last_datetime, message in stream.recent_messages:
+                if last_datetime > since:
+                    subscription.put_nowait(message)
+
+            stream.subscriptions.add(subscription)
+
+        return subscription
+
+    def get_recent_messages(self, key, since):
+        """Get a stream's recent messages newer than the given datetime without subscribing to it, starting its poller
+        if it isn't already running. Clients that poll this at least once every `idle_timeout` seconds keep the poller
+        running. As for subscribers, any rows older than the recent messages are fetched for the client.
+
+        :param tuple key: the key of the stream
+        :param datetime.datetime since: the datetime of the last row the client already has
+        :return list(str): the messages (JSON strings)
+        """
+        backfill = self._get_backfill(key, since)
+
+        with self._lock:
+            stream = self._get_stream(key, since)
+            stream.last_active = time.monotonic()
+            messages = [message for last_datetime, message in stream.recent_messages if last_datetime > since]
+
+        return ([backfill] if backfill is not None else []) + messages
+
+    def unsubscribe(self, key, subscription):
+        """Unsubscribe from a stream. Its poller stops once it's been idle for long enough.
+
+        :param tuple key: the key of the stream
+        :param queue.Queue subscription: the queue returned by `subscribe`
+        :return None:
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+
+            if stream is not None:
+                stream.subscriptions.discard(subscription)
+
+    def _is_full(self):
+        """Check whether the hub has the maximum number of subscribers. The hub's lock must be held.
+
+        :return bool:
+        """
+        number_of_subscribers = sum(len(stream.subscriptions) for stream in self._streams.values())
+        return self.max_subscribers is not None and number_of_subscribers >= self.max_subscribers
+
+    def _get_backfill(self, key, since):
+        """If a stream is running but its recent messages don't include all the rows since the given datetime (e.g.
+        because the client's last row is older than the stream), fetch those rows directly. They're fetched up to the
+        present, so they overlap with the recent messages; clients skip the rows they already have.
+
+        :param tuple key: the key of the stream
+        :param datetime.datetime since: the datetime of the last row the client already has
+        :return str|None: a message (a JSON string) with the rows, or `None` if none are missing
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+
+            if stream is None or since >= stream.replay_since:
+                return None
+
+        try:
+            data = self.fetch(key, since)
+        except Exception:
+            logger.exception("Failed to backfill live stream %r.", key)
+            return None
+
+        if data is None:
+            return None
+
+        return json.dumps(data)
+
+    def _get_stream(self, key, since):
+        """Get a stream, starting its poller if it isn't already running. The hub's lock must be held.
+
+        :param tuple key: the key of the stream
+        :param datetime.datetime since: the datetime to start polling from if the stream isn't running
+        :return _Stream:
+        """
+        stream = self._streams.get(key)
+
+        if stream is None:
+            stream = self._streams[key] = _Stream(last_datetime=since, replay_length=self.replay_length)
+            threading.Thread(target=self._poll, args=(key, stream), daemon=True).start()
+            logger.info("Started polling live stream %r.", key)
+
+        return stream
+
+    def _poll(self, key, stream):
+        """Poll a stream for new rows and push them to its subscribers until it's been idle for long enough.
+
+        :param tuple key: the key of the stream
+        :param _Stream stream:
+        :return None:
+        """
+        while True:
+            with self._lock:
+                if stream.subscriptions:
+                    stream.last_active = time.monotonic()
+                elif time.monotonic() - stream.last_active > self.idle_timeout:
+                    del self._streams[key]
+                    logger.info("Stopped polling idle live stream %r.", key)
+                    return
+
+            try:
+                data = self.fetch(key, stream.last_datetime)
+            except Exception:
+                logger.exception("Failed to poll live stream %r.", key)
+                data = None
+
+            if data is not None:
+                stream.last_datetime = dt.datetime.fromisoformat(data["last_datetime"])
+                self._publish(stream, json.dumps(data))
+
+            time.sleep(self.interval)
+
+    def _publish(self, stream, message):
+        """Push a message to all of a stream's subscribers. Any that have fallen too far behind are dropped and sent
+        `None` to end their response, so their clients reconnect and catch up.
+
+        :param _Stream stream:
+        :param str message:
+        :return None:
+        """
+        with self._lock:
+            # The oldest message is about to be dropped, so later subscribers must be sent the rows in it another way.
+            if len(stream.recent_messages) == stream.recent_messages.maxlen:
+                stream.replay_since = stream.recent_messages[0][0]
+
+            stream.recent_messages.append((stream.last_datetime, message))
+
+            for subscription in list(stream.subscriptions):
+                try:
+                    subscription.put_nowait(message)
+                except queue.Full:
+                    logger.warning("Dropped a live data subscriber that isn't keeping up.")
+                    stream.subscriptions.discard(subscription)
+
+                    with subscription.mutex:
+                        subscription.queue.clear()
+
+                    subscription.put_nowait(None)
+
+
+class _Stream:
+    """The state of a live data stream.
+
+    :param datetime.datetime last_datetime: the datetime of the last row fetched
+    :param int replay_length: the number of recent messages to keep for new subscribers
+    :return None:
+    """
+
+    def __init__(self, last_datetime, replay_length):
+        self.last_datetime = last_datetime
+        # Every row after this datetime is in the recent messages.
+        self.replay_since = last_datetime
+        self.last_active = time.monotonic()
+        self.subscriptions = set()
+        self.recent_messages = collections.deque(maxlen=replay_length)
+
+
+def create_live_data_response(hub, key, since, heartbeat_interval=15):
+    """Create a server-sent events response streaming a live data stream's messages to the client until it
+    disconnects. A comment is sent when there's been no message for `heartbeat_interval` seconds so that disconnected
+    clients are noticed and proxies don't close the connection.
+
+    :param LiveDataHub hub:
+    :param tuple key: the key of the stream
+    :param datetime.datetime since: the datetime of the last row the client already has
+    :param float heartbeat_interval:
+    :return flask.Response: the streaming response, or a 503 response if the hub already has the maximum number of subscribers
+    """
+    subscription = hub.subscribe(key, since)
+
+    # The client's `EventSource` doesn't reconnect after an error status, so it falls back to polling.
+    if subscription is None:
+        logger.warning("Turned away a live data subscriber as there are already %d.", hub.max_subscribers)
+
+        return flask.Response(
+            "Too many live data subscribers - poll for new data instead.",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": str(int(hub.idle_timeout))},
+        )
+
+    def stream():
+        try:
+            while True:
+                try:
+                    message = subscription.get(timeout=heartbeat_interval)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if message is None:
+                    return
+
+                yield f"data: {message}\n\n"
+        finally:
+            hub.unsubscribe(key, subscription)
+
+    return flask.Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def create_recent_live_data_response(hub, key, since):
+    """Create a response with a live data stream's recent messages as a JSON array, for clients polling for new data
+    instead of subscribing to the stream.
+
+    :param LiveDataHub hub:
+    :param tuple key: the key of the stream
+    :param datetime.datetime since: the datetime of the last row the client already has
+    :return flask.Response:
+    """
+    messages = hub.get_recent_messages(key, since)
+    return flask.Response(f"[{','.join(messages)}]", mimetype="application/json", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,320 @@
+import datetime as dt
+import logging
+import threading
+
+import google.auth
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery, bigquery_storage
+
+from aerosense_tools.queries import BigQuery as AerosenseBigQuery
+from dashboard.downsampling import StreamingAggregator
+
+
+logger = logging.getLogger(__name__)
+
+
+PROJECT_NAME = "aerosense-twined"
+DATASET_NAME = "aerosense-twined.greta"
+DEFAULT_NUMBER_OF_BUCKETS = 2500
+
+
+class BigQuery(AerosenseBigQuery):
+    """The `aerosense-tools` BigQuery queries extended with the queries the dashboard needs to plot long time ranges
+    without downloading every row. Pass in an existing client (e.g. from a `BigQueryClientFactory`) to reuse its
+    credentials and connections instead of creating new ones.
+
+    The BigQuery Storage read client is only used by the queries defined here. The queries inherited from
+    `aerosense-tools` (e.g. `get_sensor_data` and `get_aggregated_connection_statistics`) download their results with a
+    new read client each time, as `aerosense-tools` doesn't let one be passed in.
+
+    :param str project_name: the name of the Google Cloud project to query (ignored if `client` is given)
+    :param google.cloud.bigquery.Client|None client: the client to run queries with
+    :param google.cloud.bigquery_storage.BigQueryReadClient|None bqstorage_client: the BigQuery Storage read client to download query results with; if `None`, a new one is created for each download
+    :param google.auth.credentials.Credentials|None credentials: the credentials to create new BigQuery Storage read clients with; if `None`, the default credentials are used
+    :return None:
+    """
+
+    def __init__(self, project_name=PROJECT_NAME, client=None, bqstorage_client=None, credentials=None):
+        if client is None:
+            super().__init__(project_name=project_name)
+        else:
+            self.client = client
+
+        self.bqstorage_client = bqstorage_client
+        self.credentials = credentials
+
+    def get_sensor_data_summary(self, installation_reference, node_id, sensor_type_reference, start, finish):
+        """Get the number of rows of sensor data for the given sensor type on the given node (or all nodes if `node_id`
+        is `None`) of the given installation over the given time period, along with the datetimes of the first and last
+        rows.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_type_reference:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (int, datetime.datetime|None, datetime.datetime|None): the number of rows and the first and last datetimes
+        """
+        conditions, query_parameters = self._get_sensor_data_conditions(installation_reference, node_id, start, finish)
+
+        query = f"""
+        SELECT COUNT(datetime) AS number_of_rows, MIN(datetime) AS first_datetime, MAX(datetime) AS last_datetime
+        FROM `{DATASET_NAME}.sensor_data_{sensor_type_reference}`
+        {conditions}
+        """
+
+        result = list(
+            self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)).result()
+        )[0]
+
+        return result["number_of_rows"], result["first_datetime"], result["last_datetime"]
+
+    def get_sensor_data_summary_by_node(self, installation_reference, sensor_type_reference, start, finish):
+        """Get the number of rows of sensor data for the given sensor type on each node of the given installation over
+        the given time period, along with the datetimes of their first and last rows. Nodes without any rows are left
+        out.
+
+        :param str installation_reference:
+        :param str sensor_type_reference:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return dict(str, (int, datetime.datetime, datetime.datetime)): the number of rows and the first and last datetimes for each node, by node ID
+        """
+        conditions, query_parameters = self._get_sensor_data_conditions(installation_reference, None, start, finish)
+
+        query = f"""
+        SELECT
+          node_id,
+          COUNT(datetime) AS number_of_rows,
+          MIN(datetime) AS first_datetime,
+          MAX(datetime) AS last_datetime
+        FROM `{DATASET_NAME}.sensor_data_{sensor_type_reference}`
+        {conditions}
+        GROUP BY node_id
+        ORDER BY node_id
+        """
+
+        rows = self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)).result()
+
+        return {
+            row["node_id"]: (row["number_of_rows"], row["first_datetime"], row["last_datetime"])
+            for row in rows
+            if row["number_of_rows"] > 0
+        }
+
+    def get_aggregated_sensor_data(
+        self,
+        installation_reference,
+        node_id,
+        sensor_type_reference,
+        number_of_data_columns,
+        start,
+        finish,
+        number_of_buckets=DEFAULT_NUMBER_OF_BUCKETS,
+    ):
+        """Get the minimum, mean and maximum of each data column of the given sensor type over equal time buckets
+        spanning the given time period. The aggregation is done in BigQuery so only one row per bucket (and node) is
+        downloaded, however many rows the time period contains.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_type_reference:
+        :param int number_of_data_columns: the number of data columns (`f0`, `f1`, ...) the sensor type has
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param int number_of_buckets: the number of time buckets to split the time period into
+        :return (pandas.DataFrame, datetime.timedelta): the aggregated data (with `datetime` set to the start of each bucket and `f<i>_min`, `f<i>_mean` and `f<i>_max` columns) and the bucket duration
+        """
+        bucket_duration = get_bucket_duration(start, finish, number_of_buckets)
+        conditions, query_parameters = self._get_sensor_data_conditions(installation_reference, node_id, start, finish)
+
+        query_parameters.append(
+            bigquery.ScalarQueryParameter(
+                "bucket_microseconds", "INT64", bucket_duration // dt.timedelta(microseconds=1)
+            )
+        )
+
+        aggregations = ",\n".join(
+            f"MIN(f{i}) AS f{i}_min, AVG(f{i}) AS f{i}_mean, MAX(f{i}) AS f{i}_max"
+            for i in range(number_of_data_columns)
+        )
+
+        query = f"""
+        SELECT
+          DATETIME(
+            TIMESTAMP_MICROS(DIV(UNIX_MICROS(TIMESTAMP(datetime)), @bucket_microseconds) * @bucket_microseconds)
+          ) AS datetime,
+          node_id,
+          {aggregations}
+        FROM `{DATASET_NAME}.sensor_data_{sensor_type_reference}`
+        {conditions}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """
+
+        df = (
+            self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters))
+            .result()
+            .to_dataframe(bqstorage_client=self.bqstorage_client)
+        )
+
+        logger.info(
+            "Downloaded %d aggregated rows of %r data in %s buckets.",
+            len(df),
+            sensor_type_reference,
+            bucket_duration,
+        )
+
+        return df, bucket_duration
+
+    def stream_aggregated_sensor_data(
+        self,
+        installation_reference,
+        node_id,
+        sensor_type_reference,
+        number_of_data_columns,
+        start,
+        finish,
+        number_of_buckets=DEFAULT_NUMBER_OF_BUCKETS,
+    ):
+        """Get the same aggregates as `get_aggregated_sensor_data`, but by streaming the raw rows from BigQuery as Arrow
+        record batches via the BigQuery Storage Read API and aggregating each batch as it arrives. Only the aggregates
+        and the batches being downloaded are held in memory, so however many rows the time period contains, the memory
+        used stays about the same.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param str sensor_type_reference:
+        :param int number_of_data_columns: the number of data columns (`f0`, `f1`, ...) the sensor type has
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :param int number_of_buckets: the number of time buckets to split the time period into
+        :return (pandas.DataFrame, datetime.timedelta): the aggregated data (with `datetime` set to the start of each bucket and `f<i>_min`, `f<i>_mean` and `f<i>_max` columns) and the bucket duration
+        """
+        bucket_duration = get_bucket_duration(start, finish, number_of_buckets)
+        conditions, query_parameters = self._get_sensor_data_conditions(installation_reference, node_id, start, finish)
+        data_columns = [f"f{i}" for i in range(number_of_data_columns)]
+
+        query = f"""
+        SELECT datetime, node_id, {", ".join(data_columns)}
+        FROM `{DATASET_NAME}.sensor_data_{sensor_type_reference}`
+        {conditions}
+        """
+
+        rows = self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)).result()
+        bqstorage_client = self.bqstorage_client or bigquery_storage.BigQueryReadClient(credentials=self.credentials)
+        aggregator = StreamingAggregator(bucket_duration, data_columns)
+
+        # The rows don't need to be ordered, so they're read from several streams in parallel.
+        for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+            aggregator.add(batch.to_pandas())
+
+        logger.info(
+            "Streamed and aggregated %d rows of %r data in %s buckets.",
+            aggregator.number_of_rows,
+            sensor_type_reference,
+            bucket_duration,
+        )
+
+        return aggregator.get_aggregated_data(), bucket_duration
+
+    def _get_sensor_data_conditions(self, installation_reference, node_id, start, finish):
+        """Get the `WHERE` clause and query parameters selecting the sensor data for the given node (or all nodes if
+        `node_id` is `None`) of the given installation over the given time period.
+
+        :param str installation_reference:
+        :param str|None node_id:
+        :param datetime.datetime start:
+        :param datetime.datetime finish:
+        :return (str, list(google.cloud.bigquery.ScalarQueryParameter)):
+        """
+        conditions = "WHERE datetime BETWEEN @start AND @finish AND installation_reference = @installation_reference"
+
+        query_parameters = [
+            bigquery.ScalarQueryParameter("start", "DATETIME", start),
+            bigquery.ScalarQueryParameter("finish", "DATETIME", finish),
+            bigquery.ScalarQueryParameter("installation_reference", "STRING", installation_reference),
+        ]
+
+        if node_id is not None:
+            conditions += " AND node_id = @node_id"
+            query_parameters.append(bigquery.ScalarQueryParameter("node_id", "STRING", node_id))
+
+        return conditions, query_parameters
+
+
+class BigQueryClientFactory:
+    """A process-wide, thread-safe factory for a shared `BigQuery` instance. Its BigQuery client is created once, on
+    first use, and shared by every thread, so the credentials are only loaded (and refreshed) once and HTTP connections
+    to BigQuery are kept alive in a connection pool sized for the number of concurrent requests instead of being opened
+    for every query. The BigQuery Storage read client (and its gRPC channel) used to download query results can be
+    shared in the same way.
+
+    :param str project_name: the name of the Google Cloud project to query
+    :param int max_connections: the maximum number of HTTP connections to keep open to BigQuery
+    :param bool reuse_bqstorage_client: if `True`, share one BigQuery Storage read client between the downloads of the dashboard's own queries (see `BigQuery`); otherwise, create a new one for each download
+    :return None:
+    """
+
+    def __init__(self, project_name=PROJECT_NAME, max_connections=32, reuse_bqstorage_client=True):
+        self.project_name = project_name
+        self.max_connections = max_connections
+        self.reuse_bqstorage_client = reuse_bqstorage_client
+        self._lock = threading.Lock()
+        self._bigquery = None
+
+    def get(self):
+        """Get the shared `BigQuery` instance, creating it if this is the first call.
+
+        :return BigQuery:
+        """
+        with self._lock:
+            if self._bigquery is None:
+                self._bigquery = self._create()
+
+        return self._bigquery
+
+    def _create(self):
+        """Create a `BigQuery` instance with a pooled HTTP session and, if configured, a shared BigQuery Storage read
+        client.
+
+        :return BigQuery:
+        """
+        credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+
+        session = AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount("https://", adapter)
+
+        client = bigquery.Client(project=self.project_name, credentials=credentials, _http=session)
+
+        if self.reuse_bqstorage_client:
+            bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+        else:
+            bqstorage_client = None
+
+        logger.info(
+            "Created a shared BigQuery client for %r with up to %d pooled connections.",
+            self.project_name,
+            self.max_connections,
+        )
+
+        return BigQuery(client=client, bqstorage_client=bqstorage_client, credentials=credentials)
+
+
+def get_bucket_duration(start, finish, number_of_buckets):
+    """Get the duration of the time buckets needed to split the given time period into the given number of buckets.
+    Buckets longer than a second are rounded up to a whole number of seconds.
+
+    :param datetime.datetime start:
+    :param datetime.datetime finish:
+    :param int number_of_buckets:
+    :return datetime.timedelta:
+    """
+    bucket_duration = max((finish - start) / max(number_of_buckets, 1), dt.timedelta(microseconds=1))
+
+    if bucket_duration > dt.timedelta(seconds=1):
+        return dt.timedelta(seconds=-(-bucket_duration // dt.timedelta(seconds=1)))
+
+    return bucket_duration
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+import uuid
+
+from dashboard.coalescing import memoize_coalesced
+from dashboard.cp import get_sensor_positions
+
+
+logger = logging.getLogger(__name__)
+
+
+SENSOR_COORDINATES_VERSION_KEY = "reference_data:sensor_coordinates_version"
+
+
+class ReferenceData:
+    """The slowly-changing reference data the dashboard's selectors and plots need (sensor types, installations and
+    sensor coordinates). Each is only queried when it's first needed and is then cached, so importing the app and
+    serving its layout never waits for BigQuery. The sensor coordinates are only queried again when they're explicitly
+    refreshed and each process keeps them in memory, along with the sensor positions for each sensor coordinates
+    reference, so the Cp plots never wait for BigQuery or the cache. Refreshing them in one process makes the others
+    reload them from the cache.
+
+    :param flask_caching.Cache cache: the cache to store the reference data in
+    :param int timeout: the number of seconds to cache the reference data for
+    :param dashboard.queries.BigQueryClientFactory bigquery_factory: the factory for the shared BigQuery client
+    :return None:
+    """
+
+    def __init__(self, cache, timeout, bigquery_factory):
+        self.bigquery_factory = bigquery_factory
+        self._cache = cache
+        self._get_sensor_types = memoize_coalesced(cache, timeout=timeout)(self._query_sensor_types)
+        self._get_installations = memoize_coalesced(cache, timeout=timeout)(self._query_installations)
+        self._get_sensor_coordinates = memoize_coalesced(cache, timeout=0)(self._query_sensor_coordinates)
+
+        self._sensor_coordinates_lock = threading.Lock()
+        self._sensor_coordinates = None
+        self._sensor_coordinates_version = None
+        self._sensor_positions = {}
+
+    def get_sensor_types(self):
+        """Get the sensor types and their metadata.
+
+        :return dict:
+        """
+        return self._get_sensor_types()
+
+    def get_installations(self, refresh=False):
+        """Get the installations as dropdown options.
+
+        :param bool refresh: if `True`, query the installations again instead of using the cached ones
+        :return list(dict):
+        """
+        if refresh:
+            self._get_installations.invalidate()
+
+        return self._get_installations()
+
+    def get_sensor_coordinates(self, refresh=False):
+        """Get the sensor coordinates.
+
+        :param bool refresh: if `True`, query the sensor coordinates again instead of using the cached ones
+        :return pandas.DataFrame:
+        """
+        if refresh:
+            self._get_sensor_coordinates.invalidate()
+            self._cache.set(SENSOR_COORDINATES_VERSION_KEY, uuid.uuid4().hex, timeout=0)
+
+        version = self._cache.get(SENSOR_COORDINATES_VERSION_KEY)
+
+        with self._sensor_coordinates_lock:
+            if self._sensor_coordinates is None or version != self._sensor_coordinates_version:
+                self._sensor_coordinates = self._get_sensor_coordinates()
+                self._sensor_coordinates_version = version
+                self._sensor_positions = {}
+
+            return self._sensor_coordinates
+
+    def get_sensor_positions(self, sensor_coordinates_reference):
+        """Get the chordwise and thickness-wise positions of the barometers for the sensor coordinates reference.
+
+        :param str sensor_coordinates_reference:
+        :raise ValueError: if there are no sensor coordinates with the reference
+        :return (numpy.ndarray, numpy.ndarray): the x and y positions of the barometers
+        """
+        sensor_coordinates = self.get_sensor_coordinates()
+
+        with self._sensor_coordinates_lock:
+            if sensor_coordinates_reference not in self._sensor_positions:
+                self._sensor_positions[sensor_coordinates_reference] = get_sensor_positions(
+                    sensor_coordinates,
+                    sensor_coordinates_reference,
+                )
+
+            return self._sensor_positions[sensor_coordinates_reference]
+
+    def warm(self):
+        """Load all the reference data into the cache, logging how long each takes to load. This is meant to be run in
+        a background thread when the app starts.
+
+        :return None:
+        """
+        for name, get in (
+            ("sensor types", self.get_sensor_types),
+            ("installations", self.get_installations),
+            ("sensor coordinates", self.get_sensor_coordinates),
+        ):
+            start_time = time.perf_counter()
+
+            try:
+                get()
+            except Exception:
+                logger.exception("Failed to load the %s into the cache.", name)
+                continue
+
+            logger.info("Loaded the %s into the cache in %.2fs.", name, time.perf_counter() - start_time)
+
+    def _query_sensor_types(self):
+        """Query the sensor types.
+
+        :return dict:
+        """
+        return self.bigquery_factory.get().get_sensor_types()
+
+    def _query_installations(self):
+        """Query the installations.
+
+        :return list(dict):
+        """
+        return self.bigquery_factory.get().get_installations()
+
+    def _query_sensor_coordinates(self):
+        """Query the sensor coordinates.
+
+        :return pandas.DataFrame:
+        """
+        return self.bigquery_factory.get().get_sensor_coordinates()
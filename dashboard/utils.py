@@ -1,4 +1,7 @@
 import datetime
+import re
+
+import pandas as pd
 
 
 TIME_RANGE_OPTIONS = {
@@ -10,6 +13,9 @@ TIME_RANGE_OPTIONS = {
     "Last year": datetime.timedelta(days=365),
 }
 
+X_AXIS_RANGE_PATTERN = re.compile(r"^(?P<axis>xaxis\d*)\.range(\[(?P<index>[01])\])?$")
+X_AXIS_AUTORANGE_PATTERN = re.compile(r"^xaxis\d*\.autorange$")
+
 
 def generate_time_range(time_range, measurement_session=None):
     """Generate a convenient time range to plot. The options are:
@@ -41,3 +47,46 @@ def generate_time_range(time_range, measurement_session=None):
     finish = datetime.datetime.utcnow()
     start = finish - TIME_RANGE_OPTIONS[time_range]
     return start, finish
+
+
+def get_x_axis_range(relayout_data):
+    """Get the x-axis range of a time-series graph from its relayout data (e.g. after the user has zoomed or panned).
+    For graphs with subplots, the range of the first x-axis found is used.
+
+    :param dict|None relayout_data:
+    :return (datetime.datetime, datetime.datetime)|None: the start and finish datetimes, or `None` if the relayout data doesn't include an x-axis range
+    """
+    if not relayout_data:
+        return None
+
+    for key, value in relayout_data.items():
+        match = X_AXIS_RANGE_PATTERN.match(key)
+
+        if not match:
+            continue
+
+        if match.group("index") is None:
+            start, finish = value
+        else:
+            start = relayout_data.get(f"{match.group('axis')}.range[0]")
+            finish = relayout_data.get(f"{match.group('axis')}.range[1]")
+
+            if start is None or finish is None:
+                continue
+
+        return pd.Timestamp(start).to_pydatetime(), pd.Timestamp(finish).to_pydatetime()
+
+    return None
+
+
+def is_x_axis_reset(relayout_data):
+    """Check if the relayout data of a graph shows the x-axis has been reset to its full range (e.g. after the user has
+    double-clicked the graph or clicked "Autoscale" or "Reset axes").
+
+    :param dict|None relayout_data:
+    :return bool:
+    """
+    if not relayout_data:
+        return False
+
+    return any(X_AXIS_AUTORANGE_PATTERN.match(key) and value is True for key, value in relayout_data.items())